@@ -1,12 +1,16 @@
 from typing import List, Dict, Any, Set
 from urllib.parse import urljoin, urlparse
 from collections import deque
+from functools import lru_cache
 import re
 import time
 import requests
 from bs4 import BeautifulSoup
 from urllib.robotparser import RobotFileParser
 
+from ..util.http import get_client
+from ..util.urls import canonical_url, url_domain, url_key
+
 KEYWORD_CATEGORIES = {
     'utegym': 'gym',
     'badplats': 'swimming', 'bad': 'swimming',
@@ -18,12 +22,30 @@ KEYWORD_CATEGORIES = {
 RE_COORD = re.compile(r"(?P<lat>[5-6]\d\.\d+)[,\s]+(?P<lon>(?:1\d|2[0-5])\.\d+)")
 
 
+@lru_cache(maxsize=256)
+def _robots(base: str) -> RobotFileParser:
+    # Fetched once per site through the shared client. As RFC 9309: a missing robots.txt
+    # (4xx other than 401/403) allows everything, while a server error or an unreachable
+    # site disallows everything
+    rp = RobotFileParser()
+    rp.set_url(urljoin(base, '/robots.txt'))
+    try:
+        r = get_client().get(rp.url, timeout=15)
+    except requests.RequestException:
+        rp.disallow_all = True
+        return rp
+    if r.status_code in (401, 403) or r.status_code >= 500:
+        rp.disallow_all = True
+    elif r.status_code >= 400:
+        rp.allow_all = True
+    else:
+        rp.parse(r.text.splitlines())
+    return rp
+
+
 def allowed_by_robots(base: str, path: str) -> bool:
     try:
-        rp = RobotFileParser()
-        rp.set_url(urljoin(base, '/robots.txt'))
-        rp.read()
-        return rp.can_fetch('LawnmoverBot', path)
+        return _robots(base).can_fetch('LawnmoverBot', path)
     except Exception:
         return True
 
@@ -62,8 +84,10 @@ def categorize(text: str) -> List[str]:
 
 
 def crawl_municipality(site: str, max_pages: int = 25, max_depth: int = 2, delay: float = 0.5) -> List[Dict[str, Any]]:
+    site = canonical_url(site)
     parsed = urlparse(site)
     base = f"{parsed.scheme}://{parsed.netloc}"
+    domain = url_domain(site)
     seeds = [
         '/uppleva-och-gora', '/kultur-och-fritid', '/fritid-och-kultur', '/motion-och-fritid', '/idrott', '/bad', '/utegym', '/natur', '/leder'
     ]
@@ -74,20 +98,20 @@ def crawl_municipality(site: str, max_pages: int = 25, max_depth: int = 2, delay
     queue.append((site, 0))
     results: List[Dict[str, Any]] = []
     fetched = 0
-    headers = {'User-Agent': 'LawnmoverBot/0.1 (+https://github.com/perwinroth/lawnmover)'}
 
     while queue and fetched < max_pages:
         url, depth = queue.popleft()
         if depth > max_depth:
             continue
-        if url in seen:
+        # Links written differently (trailing slash, tracking parameters, www.) are one page
+        if url_key(url) in seen:
             continue
-        seen.add(url)
+        seen.add(url_key(url))
         path = urlparse(url).path or '/'
         if not allowed_by_robots(base, path):
             continue
         try:
-            r = requests.get(url, headers=headers, timeout=15)
+            r = get_client().get(url, timeout=15)
             if r.status_code >= 400:
                 continue
             html = r.text
@@ -118,9 +142,9 @@ def crawl_municipality(site: str, max_pages: int = 25, max_depth: int = 2, delay
                 href = a['href']
                 if href.startswith('#'):
                     continue
-                next_url = urljoin(url, href)
+                next_url = canonical_url(urljoin(url, href))
                 p2 = urlparse(next_url)
-                if p2.netloc != parsed.netloc:
+                if url_domain(next_url) != domain:
                     continue
                 # Focus only on relevant sections to reduce noise
                 if any(seg in p2.path.lower() for seg in ['uppleva', 'fritid', 'kultur', 'motion', 'idrott', 'bad', 'utegym', 'natur', 'leder']):
@@ -1,7 +1,8 @@
 import os
 import json
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 # Reuse OSM scraper internals
 import sys
@@ -10,7 +11,7 @@ import overpass_scraper  # type: ignore
 
 from .sources.hav_badplatser import fetch_hav_badplatser
 from .sources.municipal_generic import fetch_municipal_dataset
-from .util.enrich import enrich_places_opengraph
+from .util.enrich import EXTRACT_VERSION, MAX_BYTES as ENRICH_MAX_BYTES, enrich_places_opengraph
 from .util.dedupe import dedupe_places
 from .util.bookable import detect_booking_type
 from .util.normalize import ensure_name
@@ -18,121 +19,252 @@ from .sources.events_ical import fetch_events
 from .sources.ckan_search import fetch_ckan_places
 from .sources.municipal_list import fetch_municipal_list
 from .crawl.municipal_crawler import crawl_municipality
-from .util.linkcheck import check_links
+from .util.linkcheck import LinkCache, check_links
 from .util.openhours import is_open_now
+from .util.http import get_client
+from .util.flatgeobuf import write_flatgeobuf
+from .util.instrument import RunReport
+from .util.checkpoint import Checkpoints, open_checkpoints
+from .util.page_cache import PageCache
+from .util.place_state import PlaceState
+from .util.place_store import PlaceStore
+from .util.urls import RedirectMap, canonical_url
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / 'data'
 
 
-def place_from_osm_feature(f: Dict[str, Any]) -> Dict[str, Any]:
-    p = f.get('properties', {})
-    [lon, lat] = f.get('geometry', {}).get('coordinates', [None, None])
-    tags = p.get('tags', {}) or {}
+def place_from_osm_feature(rec: 'overpass_scraper.PlaceRecord') -> Dict[str, Any]:
+    # Reads only the projected tags kept on the record (see OVERPASS_TAGS)
+    opening_hours = rec.tag('opening_hours')
     return {
-        'id': p.get('id'),
-        'name': p.get('name'),
-        'categories': p.get('categories', []),
-        'lat': lat,
-        'lon': lon,
-        'website': p.get('link') or p.get('osm_url'),
-        'source': {'name': 'OSM', 'url': p.get('osm_url'), 'license': 'ODbL'},
+        'id': f"{rec.type}/{rec.id}",
+        'name': rec.name,
+        'categories': list(rec.categories),
+        'lat': rec.lat,
+        'lon': rec.lon,
+        'website': rec.link or rec.osm_url,
+        'source': {'name': 'OSM', 'url': rec.osm_url, 'license': 'ODbL'},
         'amenities': [],
         'images': [],
-        'opening_hours': tags.get('opening_hours'),
-        'open_now': True if (tags.get('opening_hours') or '').strip() == '24/7' else None,
+        'opening_hours': opening_hours,
+        'open_now': True if (opening_hours or '').strip() == '24/7' else None,
         'description': None,
     }
 
 
 def run_osm(endpoint: str) -> List[Dict[str, Any]]:
     cats = list(overpass_scraper.CATEGORY_DEFS.keys())
-    feats = overpass_scraper.scrape(endpoint, cats)
+    tag_keys = overpass_scraper.parse_tag_keys(os.environ.get('OVERPASS_TAGS', ''))
+    csv = os.environ.get('OVERPASS_CSV', '0') == '1'
+    extract = os.environ.get('OSM_EXTRACT', '').strip()
+    if extract:
+        # Offline rebuild from a local .osm.pbf / OSM XML file
+        return [place_from_osm_feature(f) for f in overpass_scraper.scrape_extract(extract, cats, tag_keys=tag_keys)]
+    tiles = os.environ.get('OVERPASS_TILES', '').strip()
+    concurrency = int(os.environ.get('OVERPASS_CONCURRENCY', '2'))
+    cache = None
+    cache_dir = os.environ.get('OVERPASS_CACHE_DIR', '').strip()
+    if cache_dir:
+        cache = overpass_scraper.OverpassCache(
+            cache_dir,
+            ttl=float(os.environ.get('OVERPASS_CACHE_TTL', '86400')),
+            offline=os.environ.get('OVERPASS_CACHE_ONLY', '0') == '1',
+        )
+    combined = os.environ.get('OVERPASS_COMBINED', '0') == '1'
+    hedge = float(os.environ.get('OVERPASS_HEDGE_QUANTILE', '0'))
+    scheduler = overpass_scraper.EndpointScheduler(
+        overpass_scraper.parse_endpoints(endpoint), hedge_quantile=hedge or None
+    )
+    snapshot = os.environ.get('OVERPASS_SNAPSHOT', '').strip()
+    if snapshot:
+        # Incremental: apply changes since the last successful run to the stored snapshot
+        feats = overpass_scraper.refresh(
+            endpoint, cats, snapshot, tiles=tiles, concurrency=concurrency, cache=cache, combined=combined,
+            scheduler=scheduler, tag_keys=tag_keys, csv=csv,
+        )
+    else:
+        feats = overpass_scraper.scrape(
+            endpoint, cats, tiles=tiles, concurrency=concurrency, cache=cache, combined=combined, scheduler=scheduler,
+            tag_keys=tag_keys, csv=csv,
+        )
+    print('Overpass endpoints:\n' + scheduler.report())
     # website-only already enforced by overpass_scraper.to_feature
     return [place_from_osm_feature(f) for f in feats]
 
 
-def main() -> int:
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    endpoint = os.environ.get('OVERPASS_ENDPOINT', overpass_scraper.DEFAULT_ENDPOINT)
-
-    # 1) OSM
-    osm_places = run_osm(endpoint)
-
-    # 2) Hav badplatser (optional)
+def run_hav() -> List[Dict[str, Any]]:
+    # Hav badplatser (optional)
     hav_url = os.environ.get('HAV_BADPLATSER_URL', '').strip()
-    hav_places = fetch_hav_badplatser(hav_url) if hav_url else []
+    return fetch_hav_badplatser(hav_url) if hav_url else []
+
 
-    # 3) Municipal dataset (optional generic CSV/JSON)
+def run_muni() -> List[Dict[str, Any]]:
+    # Municipal dataset (optional generic CSV/JSON)
     muni_url = os.environ.get('MUNICIPAL_DATASET_URL', '').strip()
     muni_type = os.environ.get('MUNICIPAL_DATASET_TYPE', 'auto')
     muni_activity = os.environ.get('MUNICIPAL_ACTIVITY', 'outdoor')
-    muni_places = fetch_municipal_dataset(muni_url, muni_type, muni_activity) if muni_url else []
+    return fetch_municipal_dataset(muni_url, muni_type, muni_activity) if muni_url else []
 
-    # 4) CKAN discovery across municipal portals (optional)
+
+def run_ckan() -> List[Dict[str, Any]]:
+    # CKAN discovery across municipal portals (optional)
     ckan_portals = os.environ.get('CKAN_PORTALS', '').strip()
     ckan_keywords = os.environ.get('CKAN_KEYWORDS', '').strip()
     ckan_activity_map = os.environ.get('CKAN_ACTIVITY_MAP', '').strip()
     ckan_max = int(os.environ.get('CKAN_MAX_PER_KEYWORD', '2'))
-    ckan_places = []
-    if ckan_portals and ckan_keywords:
-        ckan_places = fetch_ckan_places(
-            ckan_portals, ckan_keywords, activity_map_json=ckan_activity_map, max_resources_per_keyword=ckan_max
-        )
+    if not (ckan_portals and ckan_keywords):
+        return []
+    return fetch_ckan_places(
+        ckan_portals, ckan_keywords, activity_map_json=ckan_activity_map, max_resources_per_keyword=ckan_max
+    )
 
-    # Merge
-    # 5) Extra direct dataset URLs (comma-separated), activity via EXTRA_ACTIVITY
+
+def run_extra() -> List[Dict[str, Any]]:
+    # Extra direct dataset URLs (comma-separated), activity via EXTRA_ACTIVITY
     extra_urls = [u.strip() for u in os.environ.get('EXTRA_DATASET_URLS', '').split(',') if u.strip()]
     extra_activity = os.environ.get('EXTRA_ACTIVITY', 'outdoor')
     extra_places: List[Dict[str, Any]] = []
-    if extra_urls:
-        for u in extra_urls:
-            kind = 'auto'
-            if u.lower().endswith('.csv'):
-                kind = 'csv'
-            elif u.lower().endswith('.json') or 'geojson' in u.lower():
-                kind = 'json'
-            try:
-                extra_places.extend(fetch_municipal_dataset(u, kind=kind, activity=extra_activity))
-            except Exception:
-                continue
+    for u in extra_urls:
+        kind = 'auto'
+        if u.lower().endswith('.csv'):
+            kind = 'csv'
+        elif u.lower().endswith('.json') or 'geojson' in u.lower():
+            kind = 'json'
+        try:
+            extra_places.extend(fetch_municipal_dataset(u, kind=kind, activity=extra_activity))
+        except Exception:
+            continue
+    return extra_places
+
 
-    # 6) Optional municipal crawling (respect robots, limited scope)
+def run_crawl() -> List[Dict[str, Any]]:
+    # Optional municipal crawling (respect robots, limited scope)
     crawl_enabled = os.environ.get('ENABLE_MUNICIPAL_CRAWL', '0') == '1'
     crawl_list_url = os.environ.get('MUNI_LIST_URL', '').strip()
-    crawl_sites = []
     crawl_places: List[Dict[str, Any]] = []
-    if crawl_enabled:
-        muni_list = fetch_municipal_list(crawl_list_url) if crawl_list_url else []
-        # Fallback to a few known large municipalities if list not provided
-        if not muni_list:
-            muni_list = [
-                {'name': 'Stockholm', 'website': 'https://www.stockholm.se'},
-                {'name': 'Göteborg', 'website': 'https://www.goteborg.se'},
-                {'name': 'Malmö', 'website': 'https://malmo.se'},
-            ]
-        crawl_max_sites = int(os.environ.get('CRAWL_MAX_SITES', '5'))
-        crawl_max_pages = int(os.environ.get('CRAWL_MAX_PAGES', '25'))
-        crawl_max_depth = int(os.environ.get('CRAWL_MAX_DEPTH', '2'))
-        for m in muni_list[:crawl_max_sites]:
-            site = (m.get('website') or '').strip()
-            if site:
-                crawl_sites.append(site)
-                try:
-                    crawl_places.extend(crawl_municipality(site, max_pages=crawl_max_pages, max_depth=crawl_max_depth))
-                except Exception:
-                    continue
-
-    places = osm_places + hav_places + muni_places + ckan_places + extra_places + crawl_places
-
-    # Dedupe
-    places = dedupe_places(places)
-
-    # Enrich from website OpenGraph/schema.org (limited per run)
-    max_enrich = int(os.environ.get('ENRICH_MAX', '200'))
-    enrich_places_opengraph(places, max_items=max_enrich)
+    if not crawl_enabled:
+        return crawl_places
+    muni_list = fetch_municipal_list(crawl_list_url) if crawl_list_url else []
+    # Fallback to a few known large municipalities if list not provided
+    if not muni_list:
+        muni_list = [
+            {'name': 'Stockholm', 'website': 'https://www.stockholm.se'},
+            {'name': 'Göteborg', 'website': 'https://www.goteborg.se'},
+            {'name': 'Malmö', 'website': 'https://malmo.se'},
+        ]
+    crawl_max_sites = int(os.environ.get('CRAWL_MAX_SITES', '5'))
+    crawl_max_pages = int(os.environ.get('CRAWL_MAX_PAGES', '25'))
+    crawl_max_depth = int(os.environ.get('CRAWL_MAX_DEPTH', '2'))
+    for m in muni_list[:crawl_max_sites]:
+        site = (m.get('website') or '').strip()
+        if site:
+            try:
+                crawl_places.extend(crawl_municipality(site, max_pages=crawl_max_pages, max_depth=crawl_max_depth))
+            except Exception:
+                continue
+    return crawl_places
+
+
+# (name, fetch function, required). A failing optional stage contributes no places;
+# a failing required stage aborts the run once the other stages have finished.
+Stage = Tuple[str, Callable[[], List[Dict[str, Any]]], bool]
+
+
+# Env settings each stage's output depends on; changing one invalidates that stage's checkpoint
+STAGE_CONFIG: Dict[str, Tuple[str, ...]] = {
+    'osm': (
+        'OVERPASS_ENDPOINT', 'OVERPASS_TILES', 'OVERPASS_COMBINED', 'OVERPASS_TAGS', 'OVERPASS_CSV',
+        'OVERPASS_SNAPSHOT', 'OSM_EXTRACT',
+    ),
+    'hav': ('HAV_BADPLATSER_URL',),
+    'muni': ('MUNICIPAL_DATASET_URL', 'MUNICIPAL_DATASET_TYPE', 'MUNICIPAL_ACTIVITY'),
+    'ckan': ('CKAN_PORTALS', 'CKAN_KEYWORDS', 'CKAN_ACTIVITY_MAP', 'CKAN_MAX_PER_KEYWORD'),
+    'extra': ('EXTRA_DATASET_URLS', 'EXTRA_ACTIVITY'),
+    'crawl': ('ENABLE_MUNICIPAL_CRAWL', 'MUNI_LIST_URL', 'CRAWL_MAX_SITES', 'CRAWL_MAX_PAGES', 'CRAWL_MAX_DEPTH'),
+    'dedupe': ('DEDUPE_RADIUS_M',),
+    'enrich': ('ENRICH_MAX', 'ENRICH_TTL_DAYS', 'ENRICH_FAIL_TTL_DAYS', 'ENRICH_MAX_BYTES', 'ETL_STATE'),
+    'linkcheck': ('LINKCHECK_MAX', 'LINKCHECK_TTL_DAYS', 'LINKCHECK_FAIL_TTL_DAYS', 'LINKCHECK_CACHE'),
+    'events': ('EVENT_ICAL_URLS',),
+}
+
 
+def run_stage(
+    report: RunReport,
+    ckpt: Optional[Checkpoints],
+    name: str,
+    fn: Callable[[], Any],
+    deps: Tuple[str, ...] = (),
+    items_in: Optional[int] = None,
+    count: Callable[[Any], int] = len,
+) -> Any:
+    """Run one instrumented stage, resuming its output from a checkpoint when possible."""
+    with report.stage(name, items_in=items_in) as st:
+        if ckpt is None:
+            out = fn()
+        else:
+            config = {k: os.environ.get(k, '') for k in STAGE_CONFIG.get(name, ())}
+            out, st.resumed = ckpt.run(name, config, fn, deps)
+        st.items_out = count(out)
+    return out
+
+
+def run_sources(
+    stages: List[Stage],
+    workers: int,
+    report: Optional[RunReport] = None,
+    ckpt: Optional[Checkpoints] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Run the source stages concurrently and return their places by stage name."""
+    report = report or RunReport()
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    errors: Dict[str, Exception] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futs = {pool.submit(run_stage, report, ckpt, name, fn): (name, required) for name, fn, required in stages}
+        for fut in as_completed(futs):
+            name, required = futs[fut]
+            try:
+                results[name] = fut.result()
+            except Exception as e:
+                print(f'Source {name} failed: {e}', file=sys.stderr)
+                results[name] = []
+                if required:
+                    errors[name] = e
+    for name, _, _ in stages:
+        if name in errors:
+            raise errors[name]
+    return results
+
+
+def enrich_stage(places: List[Dict[str, Any]], state: PlaceState, links: LinkCache, redirects: RedirectMap) -> List[Dict[str, Any]]:
+    # Enrich from website OpenGraph/schema.org: at most ENRICH_MAX pages and ENRICH_BUDGET_S
+    # seconds per run, new or changed places first, then the longest overdue; other places
+    # reuse their stored result until ENRICH_TTL_DAYS. Failed fetches are retried after
+    # ENRICH_FAIL_TTL_DAYS, doubling per failure in a row
+    # ENRICH_PAGE_CACHE keeps ETag/Last-Modified per page so refetches can end in a 304
+    cache = PageCache(os.environ.get('ENRICH_PAGE_CACHE', '').strip() or None, version=EXTRACT_VERSION)
+    budget = float(os.environ.get('ENRICH_BUDGET_S', '0'))
+    enrich_places_opengraph(
+        places,
+        max_items=int(os.environ.get('ENRICH_MAX', '200')),
+        state=state,
+        ttl_days=float(os.environ.get('ENRICH_TTL_DAYS', '30')),
+        fail_ttl_days=float(os.environ.get('ENRICH_FAIL_TTL_DAYS', '1')),
+        concurrency=int(os.environ.get('ENRICH_CONCURRENCY', '20')),
+        per_host=int(os.environ.get('ENRICH_PER_HOST', '2')),
+        budget_s=budget if budget > 0 else None,
+        max_bytes=int(os.environ.get('ENRICH_MAX_BYTES', str(ENRICH_MAX_BYTES))),
+        cache=cache,
+        redirects=redirects,
+        links=links,
+    )
+    state.save()
+    cache.save()
+    links.save()
+    return places
+
+
+def annotate_stage(places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     # Detect booking capability
     for p in places:
         bt = detect_booking_type(p.get('website'))
@@ -143,18 +275,53 @@ def main() -> int:
     # Ensure all places have a better-than-default name
     for p in places:
         ensure_name(p)
+    return places
+
+
+def linkcheck_stage(places: List[Dict[str, Any]], links: LinkCache, redirects: RedirectMap) -> List[Dict[str, Any]]:
+    # Link checks, one per page: results are kept per page (LINKCHECK_CACHE) for
+    # LINKCHECK_TTL_DAYS if the link worked; broken links are retried after
+    # LINKCHECK_FAIL_TTL_DAYS, backing off on repeated failures. Due pages are checked
+    # never-checked first, then longest overdue, within LINKCHECK_MAX checks (0: none,
+    # 'all': no cap) and LINKCHECK_BUDGET_S seconds. Pages fetched by enrichment this run
+    # are not due
+    max_raw = (os.environ.get('LINKCHECK_MAX', '').strip() or '200').lower()
+    max_linkcheck = None if max_raw == 'all' else int(max_raw)
+    budget = float(os.environ.get('LINKCHECK_BUDGET_S', '0'))
+    by_key: Dict[str, List[Dict[str, Any]]] = {}
+    for pl in places:
+        if pl.get('website'):
+            by_key.setdefault(redirects.key(pl['website']), []).append(pl)
+    due = links.due(by_key)
+    if max_linkcheck is not None:
+        due = due[:max(0, max_linkcheck)]
+    urls = {canonical_url(by_key[k][0]['website']): k for k in due}
+    try:
+        check_links(
+            list(urls),
+            concurrency=int(os.environ.get('LINKCHECK_CONCURRENCY', '10')),
+            per_host=int(os.environ.get('LINKCHECK_PER_HOST', '2')),
+            host_delay_s=float(os.environ.get('LINKCHECK_HOST_DELAY_S', '0.5')),
+            budget_s=budget if budget > 0 else None,
+            on_result=lambda res: links.put(urls[res['url']], res),
+        )
+    finally:
+        # Results are stored as they come in, so even an interrupted run keeps its checks
+        links.save()
+    for key, group in by_key.items():
+        res = links.latest(key)
+        if res is None:
+            continue
+        for pl in group:
+            pl['link_ok'] = bool(res.get('ok'))
+            if res.get('status') is not None:
+                pl['link_status'] = res.get('status')
+            if res.get('final') and canonical_url(res['final']) != canonical_url(pl['website']):
+                pl['website_final'] = res.get('final')
+    return places
 
-    # Link checks (limit to avoid long runs)
-    max_linkcheck = int(os.environ.get('LINKCHECK_MAX', '200'))
-    sample = [pl for pl in places if pl.get('website')][:max_linkcheck]
-    results = check_links([pl['website'] for pl in sample], concurrency=int(os.environ.get('LINKCHECK_CONCURRENCY', '10')))
-    for pl, res in zip(sample, results):
-        pl['link_ok'] = bool(res.get('ok'))
-        if res.get('status') is not None:
-            pl['link_status'] = res.get('status')
-        if res.get('final') and res.get('final') != pl.get('website'):
-            pl['website_final'] = res.get('final')
 
+def openhours_stage(places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     # Opening-hours evaluation (basic): compute open_now where possible
     for pl in places:
         oh = (pl.get('opening_hours') or '').strip()
@@ -166,6 +333,13 @@ def main() -> int:
             val = is_open_now(oh)
             if val is not None:
                 pl['open_now'] = val
+    return places
+
+
+def write_outputs(places: List[Dict[str, Any]]) -> int:
+    # Place store for the tools (streamed, filtered reads); places.json stays for the site
+    with PlaceStore(os.environ.get('PLACE_STORE', '').strip() or str(DATA_DIR / 'places.sqlite')) as store:
+        store.replace_all(places)
 
     # Write combined JSON and GeoJSON for the map
     (DATA_DIR / 'places.json').write_text(json.dumps(places, ensure_ascii=False), encoding='utf-8')
@@ -190,13 +364,79 @@ def main() -> int:
             },
         })
     (DATA_DIR / 'lawnmover.geojson').write_text(json.dumps({'type': 'FeatureCollection', 'features': features}, ensure_ascii=False), encoding='utf-8')
+    # Same features with a spatial index, for bbox reads via HTTP range requests
+    write_flatgeobuf(features, str(DATA_DIR / 'lawnmover.fgb'), name='lawnmover')
+    return len(features)
+
+
+def main() -> int:
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    # ETL_PROFILE=1 dumps cProfile stats per stage to data/profiles (or to the given directory)
+    profile = os.environ.get('ETL_PROFILE', '').strip()
+    report = RunReport(profile_dir=str(DATA_DIR / 'profiles') if profile == '1' else ('' if profile in ('', '0') else profile))
+    try:
+        return _run(report)
+    finally:
+        report.write(str(DATA_DIR / 'run_report.json'))
+        print('Stages:\n' + report.summary())
+
+
+def _run(report: RunReport) -> int:
+    # ETL_CHECKPOINT_DIR enables resumable runs; ETL_INVALIDATE=enrich,linkcheck (or all) forces stages to rerun
+    ckpt = open_checkpoints(os.environ.get('ETL_CHECKPOINT_DIR', '').strip(), os.environ.get('ETL_INVALIDATE', ''))
+    endpoint = os.environ.get('OVERPASS_ENDPOINT', overpass_scraper.DEFAULT_ENDPOINT)
+
+    # Source stages are independent and network-bound, so they run concurrently
+    stages: List[Stage] = [
+        ('osm', lambda: run_osm(endpoint), True),
+        ('hav', run_hav, False),
+        ('muni', run_muni, False),
+        ('ckan', run_ckan, False),
+        ('extra', run_extra, False),
+        ('crawl', run_crawl, False),
+    ]
+    res = run_sources(stages, int(os.environ.get('ETL_WORKERS', str(len(stages)))), report, ckpt)
+    osm_places, hav_places, muni_places = res['osm'], res['hav'], res['muni']
+    ckan_places, extra_places, crawl_places = res['ckan'], res['extra'], res['crawl']
+
+    # Merge in fixed stage order (independent of completion order) so dedupe is deterministic
+    merged = osm_places + hav_places + muni_places + ckan_places + extra_places + crawl_places
+
+    # Each later stage consumes the previous one's output; deps make a recomputed stage
+    # invalidate the checkpoints downstream of it
+    # Per-place results of earlier runs; ETL_STATE persists them so only new, changed or
+    # expired places are fetched again; LINKCHECK_CACHE does the same for link checks, per
+    # page. Redirects seen by earlier link checks make
+    # http/https, www. and moved addresses of one page share a key in dedupe and fetches
+    state = PlaceState(os.environ.get('ETL_STATE', '').strip() or None)
+    links = LinkCache(
+        os.environ.get('LINKCHECK_CACHE', '').strip() or None,
+        ok_ttl_s=float(os.environ.get('LINKCHECK_TTL_DAYS', '14')) * 86400,
+        fail_ttl_s=float(os.environ.get('LINKCHECK_FAIL_TTL_DAYS', '1')) * 86400,
+    )
+    redirects = RedirectMap().learn_all(links.results())
+    places = run_stage(report, ckpt, 'dedupe',
+                       lambda: dedupe_places(merged, radius_m=float(os.environ.get('DEDUPE_RADIUS_M', '100')), redirects=redirects),
+                       deps=tuple(name for name, _, _ in stages), items_in=len(merged))
+    state.observe(places)
+    places = run_stage(report, ckpt, 'enrich', lambda: enrich_stage(places, state, links, redirects), deps=('dedupe',), items_in=len(places),
+                       count=lambda ps: sum(1 for p in ps if p.get('images') or p.get('description')))
+    places = run_stage(report, ckpt, 'annotate', lambda: annotate_stage(places), deps=('enrich',), items_in=len(places),
+                       count=lambda ps: sum(1 for p in ps if p.get('bookable')))
+    places = run_stage(report, ckpt, 'linkcheck', lambda: linkcheck_stage(places, links, redirects), deps=('annotate',), items_in=len(places),
+                       count=lambda ps: sum(1 for p in ps if p.get('link_ok')))
+    places = run_stage(report, ckpt, 'openhours', lambda: openhours_stage(places), deps=('linkcheck',), items_in=len(places),
+                       count=lambda ps: sum(1 for p in ps if p.get('open_now') is not None))
+
+    with report.stage('write', items_in=len(places)) as st:
+        st.items_out = write_outputs(places)
 
     # Events (optional via ICS feeds)
     ical_env = os.environ.get('EVENT_ICAL_URLS', '').strip()
     events: List[Dict[str, Any]] = []
     if ical_env:
         urls = [u.strip() for u in ical_env.split(',') if u.strip()]
-        events = fetch_events(urls)
+        events = run_stage(report, ckpt, 'events', lambda: fetch_events(urls), items_in=len(urls))
         (DATA_DIR / 'events.json').write_text(json.dumps(events, ensure_ascii=False), encoding='utf-8')
 
     print(
@@ -207,6 +447,7 @@ def main() -> int:
         'Extra:', len(extra_places), 'Crawl:', len(crawl_places), 'Total (deduped):', len(places),
         'Events:', len(events)
     )
+    print('HTTP hosts:\n' + get_client().report())
     return 0
 
 
@@ -1,7 +1,7 @@
 from typing import List, Dict, Any
 import json
-import requests
 
+from ..util.http import get_client
 from .municipal_generic import fetch_municipal_dataset
 
 
@@ -26,7 +26,7 @@ def _guess_kind(url: str) -> str:
 
 def search_ckan_resources(portal: str, keyword: str, rows: int = 10) -> List[Dict[str, Any]]:
     try:
-        r = requests.get(
+        r = get_client().get(
             f"{portal}/api/3/action/package_search",
             params={"q": keyword, "rows": rows},
             timeout=20,
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
 from datetime import datetime, timezone
-import requests
+
+from ..util.http import get_client
 
 try:
     from icalendar import Calendar
@@ -28,7 +29,7 @@ def fetch_events(urls: List[str]) -> List[Dict[str, Any]]:
         if not url:
             continue
         try:
-            r = requests.get(url, timeout=30)
+            r = get_client().get(url, timeout=30)
             r.raise_for_status()
             cal = Calendar.from_ical(r.content)
         except Exception:
@@ -1,6 +1,7 @@
 import json
 from typing import List, Dict, Any
-import requests
+
+from ..util.http import get_client
 
 
 def fetch_hav_badplatser(url: str) -> List[Dict[str, Any]]:
@@ -12,7 +13,7 @@ def fetch_hav_badplatser(url: str) -> List[Dict[str, Any]]:
     if not url:
         return []
     try:
-        r = requests.get(url, timeout=30)
+        r = get_client().get(url, timeout=30)
         r.raise_for_status()
         data = r.json()
     except Exception:
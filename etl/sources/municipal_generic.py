@@ -2,7 +2,8 @@ import csv
 import io
 import json
 from typing import List, Dict, Any
-import requests
+
+from ..util.http import get_client
 
 
 def fetch_municipal_dataset(url: str, kind: str = 'auto', activity: str = 'outdoor') -> List[Dict[str, Any]]:
@@ -13,7 +14,7 @@ def fetch_municipal_dataset(url: str, kind: str = 'auto', activity: str = 'outdo
     if not url:
         return []
     try:
-        r = requests.get(url, timeout=30)
+        r = get_client().get(url, timeout=30)
         r.raise_for_status()
         content = r.content
         text = None
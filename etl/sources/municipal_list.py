@@ -2,9 +2,10 @@ from typing import List, Dict, Any
 import csv
 import io
 import json
-import requests
 from pathlib import Path
 
+from ..util.http import get_client
+
 
 def fetch_municipal_list(url: str) -> List[Dict[str, Any]]:
     """Fetch a list of Swedish municipalities with optional websites.
@@ -24,7 +25,7 @@ def fetch_municipal_list(url: str) -> List[Dict[str, Any]]:
             return []
     elif url.startswith('http://') or url.startswith('https://'):
         try:
-            r = requests.get(url, timeout=30)
+            r = get_client().get(url, timeout=30)
             r.raise_for_status()
             content = r.content
         except Exception:
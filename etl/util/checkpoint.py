@@ -0,0 +1,96 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+_MISSING = object()
+
+
+def _digest(config: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class Checkpoints:
+    """Persist stage outputs under <root>/<run_id>/ so a failed run can resume where it stopped.
+
+    Each checkpoint is keyed by stage name and a digest of the stage's input config, so a
+    changed setting never resumes from stale output. A stage only resumes if every stage it
+    depends on resumed too; once one is recomputed, everything downstream is recomputed.
+    Stages named in `invalidate` (or all, with "all") are always recomputed.
+    """
+
+    def __init__(self, root: str, run_id: str, invalidate: Iterable[str] = ()):
+        self.dir = Path(root) / run_id
+        self.invalidate: Set[str] = {s.strip() for s in invalidate if s.strip()}
+        self._lock = threading.Lock()
+        self._fresh: Set[str] = set()  # stages computed (not resumed) in this process
+
+    def _path(self, stage: str, config: Dict[str, Any]) -> Path:
+        return self.dir / f"{stage}-{_digest(config)}.json.gz"
+
+    def load(self, stage: str, config: Dict[str, Any], deps: Iterable[str] = ()) -> Any:
+        """Return the stored output of `stage`, or _MISSING if it has to be (re)computed."""
+        with self._lock:
+            stale = stage in self.invalidate or "all" in self.invalidate or any(d in self._fresh for d in deps)
+        path = self._path(stage, config)
+        if stale or not path.exists():
+            return _MISSING
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Truncated or corrupt checkpoint: recompute
+            return _MISSING
+
+    def save(self, stage: str, config: Dict[str, Any], value: Any) -> None:
+        with self._lock:
+            self._fresh.add(stage)
+        path = self._path(stage, config)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def run(self, stage: str, config: Dict[str, Any], fn: Callable[[], Any], deps: Iterable[str] = ()) -> Tuple[Any, bool]:
+        """Return (output, resumed): the checkpointed output if usable, else fn() (which is then saved)."""
+        deps = list(deps)
+        value = self.load(stage, config, deps)
+        if value is not _MISSING:
+            return value, True
+        value = fn()
+        self.save(stage, config, value)
+        return value, False
+
+
+def default_run_id() -> str:
+    """ETL_RUN_ID, else the CI run (GITHUB_RUN_ID, shared by retries within a workflow run), else today's UTC date."""
+    return (
+        os.environ.get("ETL_RUN_ID", "").strip()
+        or os.environ.get("GITHUB_RUN_ID", "").strip()
+        or datetime.now(timezone.utc).strftime("%Y%m%d")
+    )
+
+
+def prune_runs(root: str, keep: int = 3) -> None:
+    """Delete all but the `keep` most recently modified run directories under `root`."""
+    try:
+        runs = sorted((p for p in Path(root).iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for p in runs[keep:]:
+        shutil.rmtree(p, ignore_errors=True)
+
+
+def open_checkpoints(root: Optional[str], invalidate: str = "") -> Optional[Checkpoints]:
+    if not root:
+        return None
+    ckpt = Checkpoints(root, default_run_id(), invalidate.split(","))
+    # Older runs are never resumed; keep a few for debugging and drop the rest
+    prune_runs(root)
+    return ckpt
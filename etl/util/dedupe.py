@@ -1,38 +1,255 @@
-from typing import List, Dict, Any, Tuple
+import math
+import re
+import unicodedata
+from typing import List, Dict, Any, FrozenSet, Iterator, Optional, Set, Tuple
 from urllib.parse import urlparse
 
+from .minhash import LSHIndex, minhash
+from .urls import RedirectMap
 
-def _norm_domain(url: str) -> str:
+# Lower wins when merging duplicates; unknown sources rank last
+SOURCE_PRIORITY = {'OSM': 0, 'HAV': 1, 'Municipal': 2, 'MunicipalCrawler': 3}
+
+# Stand-in names that say nothing about the place, so never count as similar
+PLACEHOLDER_NAMES = {'(namnlös)'}
+
+M_PER_DEG = 111_320.0
+
+
+def _key(p: Dict[str, Any], page: str) -> Tuple[str, str]:
+    name = (p.get('name') or '').strip().lower()
+    return (name, page.split('/', 1)[0])
+
+
+def normalize_name(name: str) -> str:
+    # Case, accents and punctuation are not significant when comparing names
+    s = unicodedata.normalize('NFKD', (name or '').lower())
+    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', s).split())
+
+
+def trigrams(name: str) -> FrozenSet[str]:
+    s = f'  {normalize_name(name)} '
+    return frozenset(s[i:i + 3] for i in range(len(s) - 2)) if s.strip() else frozenset()
+
+
+def shingles(p: Dict[str, Any]) -> FrozenSet[str]:
+    """Name trigrams plus words of the website path, for matching places without coordinates."""
+    # Page titles often end in " - Site name"; only the first part names the place
+    name = re.split(r'\s+[-|–—]\s+', p.get('name') or '')[0]
+    grams = trigrams('' if name.strip() in PLACEHOLDER_NAMES else name)
     try:
-        host = urlparse(url).netloc.lower()
-        return host[4:] if host.startswith('www.') else host
+        path = urlparse(p.get('website') or '').path
     except Exception:
-        return ''
+        path = ''
+    words = {'p:' + w for w in normalize_name(path).split() if len(w) >= 3}
+    return grams | words
 
 
-def _key(p: Dict[str, Any]) -> Tuple[str, str]:
-    name = (p.get('name') or '').strip().lower()
-    dom = _norm_domain(p.get('website') or '')
-    return (name, dom)
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two trigram sets."""
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
 
 
-def dedupe_places(places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    seen: Dict[Tuple[str, str], Dict[str, Any]] = {}
-    out: List[Dict[str, Any]] = []
-    for p in places:
-        k = _key(p)
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+
+class _Grid:
+    """Lat/lon buckets at least `radius_m` wide, so points within the radius are in adjacent cells.
+
+    Rows are `radius_m` of latitude; each row's column width in degrees of longitude is
+    sized for the row's poleward edge (plus one row), where a degree is shortest.
+    """
+
+    def __init__(self, radius_m: float):
+        self.dlat = radius_m / M_PER_DEG
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+    def _dlon(self, row: int) -> float:
+        edge = max(abs(row * self.dlat), abs((row + 1) * self.dlat)) + self.dlat
+        return self.dlat / max(math.cos(math.radians(min(edge, 89.9))), 1e-6)
+
+    def add(self, i: int, lat: float, lon: float) -> None:
+        row = math.floor(lat / self.dlat)
+        self.cells.setdefault((row, math.floor(lon / self._dlon(row))), []).append(i)
+
+    def near(self, lat: float, lon: float) -> Iterator[int]:
+        row = math.floor(lat / self.dlat)
+        for r in (row - 1, row, row + 1):
+            col = math.floor(lon / self._dlon(r))
+            for c in (col - 1, col, col + 1):
+                yield from self.cells.get((r, c), ())
+
+
+def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # Equirectangular approximation; exact enough at dedupe radii
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * 6_371_000.0
+
+
+def _priority(p: Dict[str, Any]) -> int:
+    return SOURCE_PRIORITY.get(((p.get('source') or {}).get('name')) or '', len(SOURCE_PRIORITY))
+
+
+def _is_match(
+    sim: float,
+    page_a: str,
+    page_b: str,
+    min_sim: float,
+    min_sim_same_page: float,
+    min_sim_other_domain: float,
+) -> bool:
+    if page_a and page_a == page_b:
+        return sim >= min_sim_same_page
+    if page_a and page_b and page_a.split('/', 1)[0] != page_b.split('/', 1)[0]:
+        return sim >= min_sim_other_domain
+    return sim >= min_sim
+
+
+def merge_cluster(members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge duplicates into the member from the highest-priority source (first one on ties).
+
+    Empty fields of the winner are filled from the other members in priority order;
+    categories and images are unioned.
+    """
+    ranked = sorted(members, key=_priority)
+    out = ranked[0]
+    for other in ranked[1:]:
+        for k, v in other.items():
+            if v not in (None, '', [], {}) and out.get(k) in (None, '', [], {}):
+                out[k] = v
+    if len(members) > 1:
+        out['categories'] = sorted(set(c for m in members for c in (m.get('categories') or [])))
+        out['images'] = sorted(set(i for m in members for i in (m.get('images') or [])))
+    return out
+
+
+def _lsh_pass(
+    places: List[Dict[str, Any]],
+    uf: UnionFind,
+    pages: List[str],
+    min_sim: float,
+    min_sim_same_page: float,
+    min_sim_other_domain: float,
+) -> None:
+    # Candidates from MinHash/LSH over shingles(); only pairs involving a place without
+    # coordinates are considered (pairs with both are the grid's job)
+    sh = [shingles(p) for p in places]
+    index = LSHIndex()
+    sigs = []
+    for i in range(len(places)):
+        sig = minhash(sh[i])
+        sigs.append(sig)
+        index.add(i, sig)
+
+    has_coords = [p.get('lat') is not None and p.get('lon') is not None for p in places]
+    for i in range(len(places)):
+        if has_coords[i]:
+            continue
+        located: Set[int] = set()
+        for j in index.query(sigs[i]):
+            if j == i or uf.find(i) == uf.find(j):
+                continue
+            if not _is_match(similarity(sh[i], sh[j]), pages[i], pages[j], min_sim, min_sim_same_page, min_sim_other_domain):  # type: ignore[arg-type]
+                continue
+            if has_coords[j]:
+                located.add(j)
+            else:
+                uf.union(i, j)
+        # A name like "Badplats" matches places all over the country: only attach to a
+        # located place when exactly one located group matches
+        if len({uf.find(j) for j in located}) == 1:
+            uf.union(i, next(iter(located)))
+
+
+def dedupe_places(
+    places: List[Dict[str, Any]],
+    radius_m: float = 100.0,
+    min_sim: float = 0.6,
+    min_sim_same_page: float = 0.3,
+    min_sim_other_domain: float = 0.9,
+    min_sim_unlocated: float = 0.5,
+    redirects: Optional[RedirectMap] = None,
+) -> List[Dict[str, Any]]:
+    """Merge places that are the same real-world place.
+
+    Places match if they share the exact (name, domain) key, or if they lie within
+    `radius_m` of each other and their names are similar (trigram Jaccard): at least
+    `min_sim`, or only `min_sim_same_page` when both link to the same page (domain and
+    path, compared as canonical URLs after the learned `redirects`), but
+    `min_sim_other_domain` when their websites are on different domains.
+    A shared domain alone lowers nothing: municipal sites list many nearby places. Candidate pairs come from a
+    grid index (only neighbouring cells are compared), matches are grouped with
+    union-find and each group is merged with merge_cluster(). Output keeps the position
+    of each group's first place.
+
+    Places without coordinates are matched by MinHash/LSH over name trigrams and website
+    path words instead (at least `min_sim_unlocated` Jaccard, same page/domain rules),
+    against each other and against located places.
+    """
+    n = len(places)
+    uf = UnionFind(n)
+    # One page usually describes one place, one domain often many
+    redirects = redirects or RedirectMap()
+    pages = [redirects.key(p.get('website') or '') for p in places]
+
+    seen: Dict[Tuple[str, str], int] = {}
+    for i, p in enumerate(places):
+        k = _key(p, pages[i])
         if k in seen:
-            # merge categories and images
-            prev = seen[k]
-            prev['categories'] = sorted(set((prev.get('categories') or []) + (p.get('categories') or [])))
-            prev['images'] = sorted(set((prev.get('images') or []) + (p.get('images') or [])))
-            # prefer existing lat/lon; if missing, take new
-            if prev.get('lat') is None and p.get('lat') is not None:
-                prev['lat'] = p['lat']
-            if prev.get('lon') is None and p.get('lon') is not None:
-                prev['lon'] = p['lon']
+            uf.union(seen[k], i)
+        else:
+            seen[k] = i
+
+    grams: List[Optional[FrozenSet[str]]] = [None] * n
+    grid = _Grid(radius_m)
+    for i, p in enumerate(places):
+        lat, lon = p.get('lat'), p.get('lon')
+        if lat is None or lon is None:
             continue
-        seen[k] = p
-        out.append(p)
-    return out
+        name = p.get('name') or ''
+        grams[i] = trigrams('' if name.strip() in PLACEHOLDER_NAMES else name)
+        for j in grid.near(lat, lon):
+            if uf.find(i) == uf.find(j):
+                continue
+            q = places[j]
+            if _distance_m(lat, lon, q['lat'], q['lon']) > radius_m:
+                continue
+            if _is_match(similarity(grams[i], grams[j]), pages[i], pages[j], min_sim, min_sim_same_page, min_sim_other_domain):  # type: ignore[arg-type]
+                uf.union(i, j)
+        grid.add(i, lat, lon)
+
+    if any(grams[i] is None for i in range(n)):
+        _lsh_pass(places, uf, pages, min_sim_unlocated, min_sim_same_page, min_sim_other_domain)
 
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(uf.find(i), []).append(i)
+    out: List[Dict[str, Any]] = []
+    for members in sorted(groups.values(), key=lambda m: m[0]):
+        out.append(merge_cluster([places[i] for i in members]))
+    return out
@@ -1,82 +1,258 @@
-from typing import List, Dict, Any
-import re
-import requests
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Optional, Sequence
+import asyncio
+import codecs
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
 
+import aiohttp
 
-def _fetch(url: str, timeout: int = 12) -> str:
-    try:
-        r = requests.get(url, timeout=timeout, headers={
-            'User-Agent': 'LawnmoverBot/0.1 (+https://github.com/perwinroth/lawnmover)'
-        })
-        r.raise_for_status()
-        return r.text
-    except Exception:
-        return ''
+from .html_meta import BODY_FIELDS, MetaExtractor, extract_meta
+from .http import DEFAULT_USER_AGENT, RETRY_STATUSES, HostPacer, get_client
+from .linkcheck import LinkCache, link_result
+from .page_cache import PageCache
+from .place_state import PlaceState
+from .urls import RedirectMap, canonical_url
 
+# Bump when extract_opengraph() changes so cached extractions are not reused
+EXTRACT_VERSION = 2
 
-def _first_attr(soup: BeautifulSoup, selectors: List[str], attr: str) -> str:
-    for sel in selectors:
-        el = soup.select_one(sel)
-        if el and el.get(attr):
-            return el.get(attr)  # type: ignore
-    return ''
+# Pages are read in chunks of this size; by default no more than MAX_BYTES of a page is read
+CHUNK_SIZE = 65536
+MAX_BYTES = 2 * 1024 * 1024
 
 
-def _first_text(soup: BeautifulSoup, selectors: List[str]) -> str:
-    for sel in selectors:
-        el = soup.select_one(sel)
-        if el and el.get_text(strip=True):
-            return el.get_text(strip=True)
-    return ''
+async def _fetch(
+    session: aiohttp.ClientSession,
+    pacer: HostPacer,
+    parser: Executor,
+    url: str,
+    needs: Sequence[str] = BODY_FIELDS,
+    headers: Optional[Dict[str, str]] = None,
+    max_bytes: int = 0,
+    timeout: float = 12,
+    retries: int = 2,
+) -> Dict[str, Any]:
+    """Fetch a page once for both enrichment and the link check.
 
+    Returns {'status', 'final', 'validators', 'info'}: the last status (0 if there never was
+    a response), the URL after redirects, ETag/Last-Modified, and the extraction (None
+    unless the page was downloaded).
 
-def enrich_places_opengraph(places: List[Dict[str, Any]], max_items: int = 200) -> None:
-    count = 0
-    for p in places:
-        if count >= max_items:
-            break
-        url = p.get('website')
-        if not isinstance(url, str) or not url:
-            continue
-        html = _fetch(url)
-        if not html:
-            continue
-        count += 1
+    The body is streamed into a MetaExtractor (on the `parser` thread) and the download
+    stops as soon as the extractor has everything `needs` asks for, or after `max_bytes`
+    (0: no cap). Same policy as the shared client: retry connection errors and 429/5xx with
+    backoff (status 0 if it never got a response); any other error is a failed fetch
+    (status 0) right away. Requests are counted in the shared HTTP stats.
+    """
+    client = get_client()
+    loop = asyncio.get_running_loop()
+    status = 0
+    final = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(min(client.max_backoff, client.backoff * (2 ** (attempt - 1))))
+        await pacer.wait(url)
+        started = time.monotonic()
+        size = 0
+        info: Optional[Dict[str, str]] = None
         try:
-            soup = BeautifulSoup(html, 'lxml')
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                status = resp.status
+                final = str(resp.url)
+                validators = {k: resp.headers[h] for k, h in (('etag', 'ETag'), ('last_modified', 'Last-Modified')) if h in resp.headers}
+                if status < 300:
+                    ex = MetaExtractor(needs)
+                    decoder = codecs.getincrementaldecoder(_charset(resp))(errors='replace')
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        if max_bytes:
+                            chunk = chunk[:max_bytes - size]
+                        size += len(chunk)
+                        if await loop.run_in_executor(parser, ex.feed, decoder.decode(chunk)):
+                            break
+                        if max_bytes and size >= max_bytes:
+                            break
+                    else:
+                        await loop.run_in_executor(parser, ex.feed, decoder.decode(b'', True))
+                    info = await loop.run_in_executor(parser, ex.result)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status, final = 0, None
+            client.record(url, requests=1, errors=1, bytes=size, latency_s=time.monotonic() - started)
+            continue
         except Exception:
-            soup = BeautifulSoup(html, 'html.parser')
-
-        title = _first_attr(soup, ['meta[property="og:title"]', 'meta[name="twitter:title"]'], 'content') or _first_text(soup, ['title', 'h1'])
-        desc = _first_attr(soup, ['meta[property="og:description"]', 'meta[name="description"]', 'meta[name="twitter:description"]'], 'content')
-        image = _first_attr(soup, ['meta[property="og:image"]', 'meta[name="twitter:image"]'], 'content')
-
-        # schema.org openingHours
-        opening = ''
-        for tag in soup.find_all(attrs={'itemprop': 'openingHours'}):
-            txt = tag.get_text(strip=True)
-            if txt:
-                opening = txt
-                break
-
-        # Simple phone/email regex
-        text = soup.get_text(" ", strip=True)
-        phone = ''
-        m = re.search(r"\+?\d[\d\s\-()]{6,}", text)
-        if m:
-            phone = m.group(0)
-
-        p.setdefault('images', [])
-        if image and image not in p['images']:
-            p['images'].append(image)
-        if desc and not p.get('description'):
-            p['description'] = desc
-        if title and p.get('name') and len(title) > len(p['name']):
-            # Prefer richer title but keep original name if OG title looks spammy
-            p['description'] = p.get('description') or title
-        if opening and not p.get('opening_hours'):
-            p['opening_hours'] = opening
-        if phone:
-            p.setdefault('contact', {})
-            p['contact']['phone'] = p['contact'].get('phone') or phone
+            # Anything else (e.g. UnicodeError from getaddrinfo for a host like 'foo..bar')
+            # will not go away on retry; a failed fetch, not the end of the whole stage
+            client.record(url, requests=1, errors=1, bytes=size, latency_s=time.monotonic() - started)
+            return {'status': 0, 'final': None, 'validators': {}, 'info': None}
+        client.record(url, requests=1, bytes=size, latency_s=time.monotonic() - started, errors=1 if status >= 400 else 0)
+        if status in RETRY_STATUSES:
+            continue
+        return {'status': status, 'final': final, 'validators': validators, 'info': info}
+    return {'status': status, 'final': final, 'validators': {}, 'info': None}
+
+
+def _charset(resp: aiohttp.ClientResponse) -> str:
+    # Charset from Content-Type, else UTF-8 (what aiohttp's get_encoding() falls back to)
+    try:
+        return codecs.lookup(resp.charset or 'utf-8').name
+    except LookupError:
+        return 'utf-8'
+
+
+def extract_opengraph(html: str, needs: Sequence[str] = BODY_FIELDS) -> Dict[str, str]:
+    """Pull title/description/image/opening hours/phone out of a page (empty values omitted).
+
+    Opening hours and phone are only looked for if listed in `needs`.
+    """
+    return extract_meta(html, needs)
+
+
+def apply_opengraph(p: Dict[str, Any], info: Dict[str, str]) -> None:
+    title = info.get('title')
+    desc = info.get('description')
+    image = info.get('image')
+    opening = info.get('opening_hours')
+    phone = info.get('phone')
+
+    p.setdefault('images', [])
+    if image and image not in p['images']:
+        p['images'].append(image)
+    if desc and not p.get('description'):
+        p['description'] = desc
+    if title and p.get('name') and len(title) > len(p['name']):
+        # Prefer richer title but keep original name if OG title looks spammy
+        p['description'] = p.get('description') or title
+    if opening and not p.get('opening_hours'):
+        p['opening_hours'] = opening
+    if phone:
+        p.setdefault('contact', {})
+        p['contact']['phone'] = p['contact'].get('phone') or phone
+
+
+def _needs(p: Dict[str, Any]) -> List[str]:
+    # Body fields worth scanning the page for: apply_opengraph() never overwrites these
+    out = []
+    if not p.get('opening_hours'):
+        out.append('opening_hours')
+    if not (p.get('contact') or {}).get('phone'):
+        out.append('phone')
+    return out
+
+
+async def _enrich_async(
+    places: List[Dict[str, Any]],
+    state: PlaceState,
+    max_pages: int,
+    concurrency: int,
+    per_host: int,
+    budget_s: Optional[float],
+    max_bytes: int,
+    cache: PageCache,
+    redirects: RedirectMap,
+    links: LinkCache,
+) -> int:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget_s if budget_s else None
+    pacer = HostPacer()
+    # Places sharing a page (one page listing several places, or the same page written or
+    # redirected differently) share one fetch; the page's canonical key also keys the cache
+    by_key: Dict[str, List[Dict[str, Any]]] = {}
+    for p in places:
+        key = redirects.key(p['website'])
+        if key in by_key or len(by_key) < max_pages:
+            by_key.setdefault(key, []).append(p)
+    queue: 'asyncio.Queue[str]' = asyncio.Queue()
+    for key in by_key:
+        queue.put_nowait(key)
+    done = 0
+
+    async def worker(session: aiohttp.ClientSession, parser: Executor) -> None:
+        nonlocal done
+        while not queue.empty():
+            key = queue.get_nowait()
+            group = by_key[key]
+            url = canonical_url(group[0]['website'])
+            wanted = {f for p in group for f in _needs(p)}
+            needs = [f for f in BODY_FIELDS if f in wanted]
+            fetch = _fetch(session, pacer, parser, url, needs, headers=cache.headers(key, needs), max_bytes=max_bytes)
+            try:
+                if deadline is None:
+                    page = await fetch
+                else:
+                    page = await asyncio.wait_for(fetch, deadline - loop.time())
+            except asyncio.TimeoutError:
+                # Out of budget: leave this and the remaining places due for the next run
+                return
+            done += 1
+            status, info = page['status'], page['info']
+            cached = cache.get(key)
+            if status == 304 and cached is not None:
+                # Unchanged since the last run: reuse its extraction. The page was fine then
+                # (only successful downloads are cached), so it still is
+                cache.touch(key)
+                info = cached['data']
+                status = 200
+            elif info is not None:
+                cache.put(key, page['validators'].get('etag'), page['validators'].get('last_modified'), info, fields=needs)
+            # The same response answers the link check, so that stage can skip this page
+            links.put(key, link_result(url, status or None, page['final']))
+            for p in group:
+                state.put(p, 'enrich', info or {}, ok=info is not None)
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    headers = {'User-Agent': get_client().session.headers.get('User-Agent', DEFAULT_USER_AGENT)}
+    # One parser thread: extraction is cheap, and an lxml parser should stay on one thread
+    with ThreadPoolExecutor(max_workers=1) as parser:
+        async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+            await asyncio.gather(*(worker(session, parser) for _ in range(max(1, concurrency))))
+    return done
+
+
+def enrich_places_opengraph(
+    places: List[Dict[str, Any]],
+    max_items: int = 200,
+    state: Optional[PlaceState] = None,
+    ttl_days: float = 30,
+    fail_ttl_days: float = 1,
+    concurrency: int = 20,
+    per_host: int = 2,
+    budget_s: Optional[float] = None,
+    max_bytes: int = MAX_BYTES,
+    cache: Optional[PageCache] = None,
+    redirects: Optional[RedirectMap] = None,
+    links: Optional[LinkCache] = None,
+) -> int:
+    """Enrich places from their websites, fetching at most `max_items` pages.
+
+    Which places are fetched is decided by state.due() (see schedule.plan()): new and
+    changed places first, then those whose result is older than `ttl_days`, longest
+    overdue first; a failed fetch is retried after `fail_ttl_days`, doubling with each
+    failure in a row up to `ttl_days`. So a fixed `max_items`/`budget_s` per run works
+    through every place over a few runs instead of refetching the same ones.
+
+    Pages are fetched concurrently (`concurrency` in total, `per_host` connections and the
+    HTTP_RATE_LIMITS/HTTP_HOST_RATE rate per host) and parsed while they stream in: the
+    download stops once the <head> metadata is read, unless the place still lacks opening
+    hours or a phone number and the body has to be scanned too, and never reads more than
+    `max_bytes` (0: no cap). With `budget_s`, no fetch runs past that many seconds; places
+    not reached stay due. Places not fetched get their previous result (from a persistent
+    `state`) merged back in. With a persistent `cache`, pages are requested conditionally
+    (If-None-Match / If-Modified-Since) and a 304 reuses the extraction stored for that URL.
+
+    Each distinct page is fetched once (websites compared as canonical URLs after the
+    learned `redirects`), and the response is also stored in `links` as the page's link
+    check result. Returns the number of pages requested.
+    """
+    state = state or PlaceState()
+    cache = cache or PageCache(version=EXTRACT_VERSION)
+    redirects = redirects or RedirectMap()
+    links = links if links is not None else LinkCache()
+    with_site = [p for p in places if isinstance(p.get('website'), str) and p['website']]
+    due = state.due(with_site, 'enrich', ttl_days * 86400, fail_ttl_days * 86400)
+    done = 0
+    if due and max_items > 0:
+        done = asyncio.run(_enrich_async(due, state, max_items, concurrency, per_host, budget_s, max_bytes, cache, redirects, links))
+    for p in with_site:
+        prev = state.get(p, 'enrich')
+        if prev and prev.get('data'):
+            apply_opengraph(p, prev['data'])
+    return done
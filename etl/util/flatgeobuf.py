@@ -0,0 +1,477 @@
+"""Minimal FlatGeobuf (v3) writer and bbox reader for Point features.
+
+A .fgb file is: magic bytes, a size-prefixed FlatBuffers header, a packed Hilbert R-tree
+over the feature bounding boxes, then size-prefixed FlatBuffers features in tree order.
+Readers (GDAL/OGR, the flatgeobuf JS/Python/Rust libraries, or iter_bbox() below) can
+answer a bbox query by reading the header and index and then only the matching features,
+e.g. with HTTP range requests against the published file.
+"""
+import json
+import math
+import os
+import struct
+import tempfile
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"fgb\x03fgb\x00"
+NODE_ITEM = struct.Struct("<ddddQ")  # min_x, min_y, max_x, max_y, offset
+
+GEOMETRY_POINT = 1
+COL_BOOL, COL_LONG, COL_DOUBLE, COL_STRING, COL_JSON = 2, 7, 10, 11, 12
+
+
+# --- FlatBuffers encoding ---------------------------------------------------------------
+# Field values are (kind, value) pairs; tables are {field_id: (kind, value)} dicts.
+# Scalar kinds: "u8", "bool", "u16", "i32", "u64", "f64"; offset kinds: "str", "bytes",
+# "f64s" (vector of doubles), "table", "tables" (vector of tables).
+
+_SCALARS = {"u8": "<B", "bool": "<B", "u16": "<H", "i32": "<i", "u64": "<Q", "f64": "<d"}
+
+
+class _Builder:
+    """Writes a size-prefixed FlatBuffer front to back: vtable, table, then the objects it references.
+
+    Alignment is relative to the start of the size prefix, as with FlatBuffers' own
+    FinishSizePrefixed(), so verifying readers accept the buffer.
+    """
+
+    def __init__(self) -> None:
+        self.buf = bytearray(4)  # size prefix
+
+    def _pad(self, align: int, extra: int = 0) -> None:
+        # Pad so that len(buf) + extra is a multiple of align
+        while (len(self.buf) + extra) % align:
+            self.buf.append(0)
+
+    def _patch_offset(self, at: int, target: int) -> None:
+        struct.pack_into("<I", self.buf, at, target - at)
+
+    def table(self, fields: Dict[int, Tuple[str, Any]]) -> int:
+        # Inline layout: 8-byte scalars first, then 4-byte offsets/scalars, then 2, then 1
+        def size(kind: str) -> int:
+            return struct.calcsize(_SCALARS[kind]) if kind in _SCALARS else 4
+
+        order = sorted(fields, key=lambda fid: -size(fields[fid][0]))
+        layout: Dict[int, int] = {}
+        pos = 4  # soffset to the vtable
+        for fid in order:
+            s = size(fields[fid][0])
+            pos += (-pos) % s
+            layout[fid] = pos
+            pos += s
+        table_size = pos
+        nfields = max(fields) + 1 if fields else 0
+
+        vtable = struct.pack("<HH", 4 + 2 * nfields, table_size)
+        vtable += b"".join(struct.pack("<H", layout.get(i, 0)) for i in range(nfields))
+        self._pad(2)
+        vt_pos = len(self.buf)
+        self.buf += vtable
+        self._pad(8)
+        start = len(self.buf)
+        self.buf += bytes(table_size)
+        struct.pack_into("<i", self.buf, start, start - vt_pos)
+
+        refs: List[Tuple[int, str, Any]] = []
+        for fid, (kind, value) in fields.items():
+            at = start + layout[fid]
+            if kind in _SCALARS:
+                struct.pack_into(_SCALARS[kind], self.buf, at, value)
+            else:
+                refs.append((at, kind, value))
+        for at, kind, value in refs:
+            self._patch_offset(at, self._object(kind, value))
+        return start
+
+    def _object(self, kind: str, value: Any) -> int:
+        if kind == "table":
+            return self.table(value)
+        if kind in ("str", "bytes"):
+            data = value.encode("utf-8") if kind == "str" else bytes(value)
+            self._pad(4)
+            start = len(self.buf)
+            self.buf += struct.pack("<I", len(data)) + data + b"\x00"
+            return start
+        if kind == "f64s":
+            self._pad(8, 4)  # elements after the length must be 8-byte aligned
+            start = len(self.buf)
+            self.buf += struct.pack(f"<I{len(value)}d", len(value), *value)
+            return start
+        if kind == "tables":
+            self._pad(4)
+            start = len(self.buf)
+            self.buf += struct.pack("<I", len(value)) + bytes(4 * len(value))
+            for i, sub in enumerate(value):
+                self._patch_offset(start + 4 + 4 * i, self.table(sub))
+            return start
+        raise ValueError(f"Unknown field kind: {kind}")
+
+    def finish(self, root: Dict[int, Tuple[str, Any]]) -> bytes:
+        self.buf += bytes(4)
+        self._patch_offset(4, self.table(root))
+        self._pad(8)
+        struct.pack_into("<I", self.buf, 0, len(self.buf) - 4)
+        return bytes(self.buf)
+
+
+def _encode(root: Dict[int, Tuple[str, Any]]) -> bytes:
+    return _Builder().finish(root)
+
+
+# --- Packed Hilbert R-tree -------------------------------------------------------------
+
+def _hilbert(x: int, y: int) -> int:
+    # 16-bit Hilbert index (same curve as the reference FlatGeobuf implementations)
+    a = x ^ y
+    b = 0xFFFF ^ a
+    c = 0xFFFF ^ (x | y)
+    d = x & (y ^ 0xFFFF)
+    A = a | (b >> 1)
+    B = (a >> 1) ^ a
+    C = ((c >> 1) ^ (b & (d >> 1))) ^ c
+    D = ((a & (c >> 1)) ^ (d >> 1)) ^ d
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 2)) ^ (b & (b >> 2))
+    B = (a & (b >> 2)) ^ (b & ((a ^ b) >> 2))
+    C ^= (a & (c >> 2)) ^ (b & (d >> 2))
+    D ^= (b & (c >> 2)) ^ ((a ^ b) & (d >> 2))
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 4)) ^ (b & (b >> 4))
+    B = (a & (b >> 4)) ^ (b & ((a ^ b) >> 4))
+    C ^= (a & (c >> 4)) ^ (b & (d >> 4))
+    D ^= (b & (c >> 4)) ^ ((a ^ b) & (d >> 4))
+    a, b, c, d = A, B, C, D
+    C ^= (a & (c >> 8)) ^ (b & (d >> 8))
+    D ^= (b & (c >> 8)) ^ ((a ^ b) & (d >> 8))
+    a = C ^ (C >> 1)
+    b = D ^ (D >> 1)
+    i0 = x ^ y
+    i1 = b | (0xFFFF ^ (i0 | a))
+
+    def spread(v: int) -> int:
+        v = (v | (v << 8)) & 0x00FF00FF
+        v = (v | (v << 4)) & 0x0F0F0F0F
+        v = (v | (v << 2)) & 0x33333333
+        return (v | (v << 1)) & 0x55555555
+
+    return (spread(i1) << 1) | spread(i0)
+
+
+def _level_bounds(num_items: int, node_size: int) -> List[Tuple[int, int]]:
+    """[start, end) node ranges per tree level, leaves first; the root is node 0."""
+    n = num_items
+    counts = [n]
+    while True:
+        n = math.ceil(n / node_size)
+        counts.append(n)
+        if n == 1:
+            break
+    total = sum(counts)
+    bounds = []
+    for count in counts:
+        total -= count
+        bounds.append((total, total + count))
+    return bounds
+
+
+def _build_tree(leaves: List[Tuple[float, float, float, float, int]], node_size: int) -> List[Tuple[float, float, float, float, int]]:
+    bounds = _level_bounds(len(leaves), node_size)
+    nodes: List[Any] = [None] * bounds[0][1]
+    nodes[bounds[0][0]:] = leaves
+    for level in range(len(bounds) - 1):
+        pos, end = bounds[level]
+        parent = bounds[level + 1][0]
+        while pos < end:
+            first = pos
+            min_x = min_y = math.inf
+            max_x = max_y = -math.inf
+            for node in nodes[pos:min(end, pos + node_size)]:
+                min_x, min_y = min(min_x, node[0]), min(min_y, node[1])
+                max_x, max_y = max(max_x, node[2]), max(max_y, node[3])
+            pos = min(end, pos + node_size)
+            # Interior nodes point at the index of their first child
+            nodes[parent] = (min_x, min_y, max_x, max_y, first)
+            parent += 1
+    return nodes
+
+
+# --- Writer -----------------------------------------------------------------------------
+
+def _column_type(value: Any) -> int:
+    if isinstance(value, bool):
+        return COL_BOOL
+    if isinstance(value, int):
+        return COL_LONG
+    if isinstance(value, float):
+        return COL_DOUBLE
+    if isinstance(value, str):
+        return COL_STRING
+    return COL_JSON
+
+
+def _encode_value(ctype: int, value: Any) -> bytes:
+    if ctype == COL_BOOL and isinstance(value, bool):
+        return struct.pack("<B", value)
+    if ctype == COL_LONG and isinstance(value, int) and not isinstance(value, bool):
+        return struct.pack("<q", value)
+    if ctype == COL_DOUBLE and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return struct.pack("<d", float(value))
+    if ctype == COL_STRING and isinstance(value, str):
+        data = value.encode("utf-8")
+    else:
+        # Json columns, and values whose type differs from the column's first value
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    return struct.pack("<I", len(data)) + data
+
+
+class FlatGeobufWriter:
+    """Stream Point features into a FlatGeobuf file with a packed Hilbert R-tree index.
+
+    Features are encoded and spooled to a temporary file as they are added, keeping only
+    their coordinates and sizes in memory. close() sorts them along a Hilbert curve and
+    writes header, index and features. Columns are taken from the properties in order of
+    first appearance, typed by their first non-null value (lists/dicts become Json).
+    """
+
+    def __init__(self, path: str, name: str = "", node_size: int = 16):
+        self.path = path
+        self.name = name
+        self.node_size = max(2, node_size)
+        self.columns: Dict[str, Tuple[int, int]] = {}  # name -> (index, type)
+        self._items: List[Tuple[float, float, int, int]] = []  # lon, lat, spool offset, size
+        self._spool: IO[bytes] = tempfile.TemporaryFile()
+        self._spooled = 0
+
+    def add(self, lon: float, lat: float, properties: Dict[str, Any]) -> None:
+        props = bytearray()
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in self.columns:
+                self.columns[key] = (len(self.columns), _column_type(value))
+            idx, ctype = self.columns[key]
+            props += struct.pack("<H", idx) + _encode_value(ctype, value)
+        geometry = {1: ("f64s", [float(lon), float(lat)])}
+        data = _encode({0: ("table", geometry), 1: ("bytes", props)})
+        self._spool.write(data)
+        self._items.append((float(lon), float(lat), self._spooled, len(data)))
+        self._spooled += len(data)
+
+    def add_feature(self, feature: Dict[str, Any]) -> None:
+        """Add a GeoJSON Point feature; features without coordinates are skipped."""
+        coords = (feature.get("geometry") or {}).get("coordinates") or [None, None]
+        if coords[0] is None or coords[1] is None:
+            return
+        self.add(coords[0], coords[1], feature.get("properties") or {})
+
+    def _header(self, envelope: Optional[List[float]]) -> bytes:
+        columns = [
+            {0: ("str", name), 1: ("u8", ctype)}
+            for name, (_, ctype) in sorted(self.columns.items(), key=lambda kv: kv[1][0])
+        ]
+        fields: Dict[int, Tuple[str, Any]] = {
+            0: ("str", self.name),
+            2: ("u8", GEOMETRY_POINT),
+            8: ("u64", len(self._items)),
+            9: ("u16", self.node_size if self._items else 0),
+            10: ("table", {0: ("str", "EPSG"), 1: ("i32", 4326)}),
+        }
+        if envelope:
+            fields[1] = ("f64s", envelope)
+        if columns:
+            fields[7] = ("tables", columns)
+        return _encode(fields)
+
+    def close(self) -> None:
+        items = self._items
+        envelope = None
+        if items:
+            min_x = min(i[0] for i in items)
+            min_y = min(i[1] for i in items)
+            max_x = max(i[0] for i in items)
+            max_y = max(i[1] for i in items)
+            envelope = [min_x, min_y, max_x, max_y]
+            w = (max_x - min_x) or 1.0
+            h = (max_y - min_y) or 1.0
+            items.sort(key=lambda i: _hilbert(int(0xFFFF * (i[0] - min_x) / w), int(0xFFFF * (i[1] - min_y) / h)), reverse=True)
+        leaves = []
+        offset = 0
+        for lon, lat, _, size in items:
+            leaves.append((lon, lat, lon, lat, offset))
+            offset += size
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(MAGIC)
+            out.write(self._header(envelope))
+            if leaves:
+                for node in _build_tree(leaves, self.node_size):
+                    out.write(NODE_ITEM.pack(*node))
+            for _, _, spool_offset, size in items:
+                self._spool.seek(spool_offset)
+                out.write(self._spool.read(size))
+        self._spool.close()
+        os.replace(tmp, self.path)
+
+    def __enter__(self) -> "FlatGeobufWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._spool.close()
+
+
+def write_flatgeobuf(features: Iterable[Dict[str, Any]], path: str, name: str = "") -> None:
+    """Write GeoJSON Point features to `path` as an indexed FlatGeobuf file."""
+    with FlatGeobufWriter(path, name=name) as writer:
+        for feat in features:
+            writer.add_feature(feat)
+
+
+# --- Reader -----------------------------------------------------------------------------
+
+class _Table:
+    def __init__(self, buf: bytes, pos: int):
+        self.buf = buf
+        self.pos = pos
+        self.vt = pos - struct.unpack_from("<i", buf, pos)[0]
+        self.vt_size = struct.unpack_from("<H", buf, self.vt)[0]
+
+    def _field(self, fid: int) -> int:
+        o = 4 + 2 * fid
+        if o >= self.vt_size:
+            return 0
+        rel = struct.unpack_from("<H", self.buf, self.vt + o)[0]
+        return self.pos + rel if rel else 0
+
+    def scalar(self, fid: int, fmt: str, default: Any = 0) -> Any:
+        at = self._field(fid)
+        return struct.unpack_from(fmt, self.buf, at)[0] if at else default
+
+    def _target(self, fid: int) -> int:
+        at = self._field(fid)
+        return at + struct.unpack_from("<I", self.buf, at)[0] if at else 0
+
+    def bytes(self, fid: int) -> bytes:
+        at = self._target(fid)
+        if not at:
+            return b""
+        n = struct.unpack_from("<I", self.buf, at)[0]
+        return self.buf[at + 4:at + 4 + n]
+
+    def doubles(self, fid: int) -> List[float]:
+        at = self._target(fid)
+        if not at:
+            return []
+        n = struct.unpack_from("<I", self.buf, at)[0]
+        return list(struct.unpack_from(f"<{n}d", self.buf, at + 4))
+
+    def table(self, fid: int) -> Optional["_Table"]:
+        at = self._target(fid)
+        return _Table(self.buf, at) if at else None
+
+    def tables(self, fid: int) -> List["_Table"]:
+        at = self._target(fid)
+        if not at:
+            return []
+        n = struct.unpack_from("<I", self.buf, at)[0]
+        out = []
+        for i in range(n):
+            elem = at + 4 + 4 * i
+            out.append(_Table(self.buf, elem + struct.unpack_from("<I", self.buf, elem)[0]))
+        return out
+
+
+def _read_sized(f: IO[bytes]) -> _Table:
+    size = struct.unpack("<I", f.read(4))[0]
+    buf = f.read(size)
+    return _Table(buf, struct.unpack_from("<I", buf, 0)[0])
+
+
+def _decode_properties(data: bytes, columns: List[Tuple[str, int]]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    pos = 0
+    while pos < len(data):
+        idx = struct.unpack_from("<H", data, pos)[0]
+        pos += 2
+        name, ctype = columns[idx]
+        if ctype == COL_BOOL:
+            out[name] = bool(data[pos])
+            pos += 1
+        elif ctype == COL_LONG:
+            out[name] = struct.unpack_from("<q", data, pos)[0]
+            pos += 8
+        elif ctype == COL_DOUBLE:
+            out[name] = struct.unpack_from("<d", data, pos)[0]
+            pos += 8
+        else:
+            n = struct.unpack_from("<I", data, pos)[0]
+            text = data[pos + 4:pos + 4 + n].decode("utf-8")
+            pos += 4 + n
+            if ctype == COL_STRING:
+                out[name] = text
+            else:
+                try:
+                    out[name] = json.loads(text)
+                except ValueError:
+                    out[name] = text
+    return out
+
+
+def iter_bbox(path: str, bbox: Optional[Tuple[float, float, float, float]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield GeoJSON features from a FlatGeobuf file whose point lies in bbox (min_lon, min_lat, max_lon, max_lat).
+
+    Supports files with String/Json/Bool/Long/Double columns, as written by FlatGeobufWriter.
+    With a bbox, only the header, the index and the matching features are read.
+    """
+    with open(path, "rb") as f:
+        if f.read(8)[:3] != MAGIC[:3]:
+            raise ValueError(f"Not a FlatGeobuf file: {path}")
+        header = _read_sized(f)
+        count = header.scalar(8, "<Q")
+        node_size = header.scalar(9, "<H", 16)
+        columns = [(c.bytes(0).decode("utf-8"), c.scalar(1, "<B")) for c in header.tables(7)]
+        index_start = f.tell()
+        num_nodes = _level_bounds(count, node_size)[0][1] if count and node_size else 0
+        features_start = index_start + num_nodes * NODE_ITEM.size
+
+        offsets: List[int] = []
+        if bbox is None or not num_nodes:
+            pos = features_start
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            while pos < end:
+                offsets.append(pos - features_start)
+                f.seek(pos)
+                pos += 4 + struct.unpack("<I", f.read(4))[0]
+        else:
+            f.seek(index_start)
+            index = f.read(num_nodes * NODE_ITEM.size)
+            bounds = _level_bounds(count, node_size)
+            leaf_start = bounds[0][0]
+            stack = [(0, len(bounds) - 1)]
+            while stack:
+                node, level = stack.pop()
+                end = min(node + node_size, bounds[level][1])
+                for i in range(node, end):
+                    min_x, min_y, max_x, max_y, off = NODE_ITEM.unpack_from(index, i * NODE_ITEM.size)
+                    if max_x < bbox[0] or min_x > bbox[2] or max_y < bbox[1] or min_y > bbox[3]:
+                        continue
+                    if i >= leaf_start:
+                        offsets.append(off)
+                    else:
+                        stack.append((off, level - 1))
+            offsets.sort()
+
+        for off in offsets:
+            f.seek(features_start + off)
+            feat = _read_sized(f)
+            geom = feat.table(0)
+            xy = geom.doubles(1) if geom else []
+            yield {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": xy[:2]} if xy else None,
+                "properties": _decode_properties(feat.bytes(1), columns),
+            }
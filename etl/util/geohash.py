@@ -0,0 +1,34 @@
+from typing import Tuple
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(lat: float, lon: float, precision: int = 7) -> str:
+    """Standard geohash of a point; 7 characters is a cell of roughly 150 m x 150 m."""
+    lat_rng = [-90.0, 90.0]
+    lon_rng = [-180.0, 180.0]
+    out = []
+    bits = 0
+    ch = 0
+    even = True
+    while len(out) < precision:
+        rng, val = (lon_rng, lon) if even else (lat_rng, lat)
+        mid = (rng[0] + rng[1]) / 2
+        ch <<= 1
+        if val >= mid:
+            ch |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits = 0
+            ch = 0
+    return ''.join(out)
+
+
+def prefix_range(prefix: str) -> Tuple[str, str]:
+    """(lo, hi) such that lo <= h < hi exactly for geohashes h starting with `prefix` (index-friendly)."""
+    return prefix, prefix + '~'
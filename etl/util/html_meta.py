@@ -0,0 +1,232 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from lxml import etree
+
+# (attribute, value) selectors per field, in priority order (as in the <head> of a page)
+META_FIELDS: Dict[str, List[Tuple[str, str]]] = {
+    'title': [('property', 'og:title'), ('name', 'twitter:title')],
+    'description': [('property', 'og:description'), ('name', 'description'), ('name', 'twitter:description')],
+    'image': [('property', 'og:image'), ('name', 'twitter:image')],
+}
+BODY_FIELDS = ('opening_hours', 'phone')
+
+PHONE_RE = re.compile(r"\+?\d[\d\s\-()]{6,}")
+# Where a phone match could still start: the trailing run of characters it may consist of
+_PHONE_TAIL_RE = re.compile(r"\+?[\d\s\-()]*$")
+
+# Text inside these elements is not page text. As in BeautifulSoup, it belongs to the
+# innermost such element only: get_text() on that element sees it, on anything else not.
+_NON_TEXT = {'script', 'style', 'template', 'rt', 'rp'}
+
+
+class _Collector:
+    """Stripped text strings of one element, joined without separator (get_text(strip=True)).
+
+    `kind` is the _NON_TEXT element the collected text must belong to ('' for page text).
+    """
+
+    __slots__ = ('depth', 'kind', 'parts', 'closed')
+
+    def __init__(self, depth: int, kind: str):
+        self.depth = depth
+        self.kind = kind
+        self.parts: List[str] = []
+        self.closed = False
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+
+class MetaExtractor:
+    """Incremental page metadata extraction without building a document tree.
+
+    Feed decoded HTML in chunks; feed() returns True once every wanted field is final, so
+    the caller can stop downloading. Title, description and image come from <meta> tags in
+    <head> (og:*, then name=description / twitter:*); the title falls back to the first
+    <title>, then the first <h1>. `needs` selects the body fields to look for: the first
+    itemprop="openingHours" element with text and the first phone-like number in the page
+    text. Results match a BeautifulSoup walk of the whole page except that <meta> tags after
+    the start of <body> are ignored.
+    """
+
+    def __init__(self, needs: Iterable[str] = BODY_FIELDS):
+        self.needs = set(needs) & set(BODY_FIELDS)
+        self._parser = etree.HTMLParser(target=self)
+        self._stack: List[str] = []
+        self._containers: List[str] = []
+        self._buf: List[str] = []
+        self._in_head = True
+        self._meta: Dict[Tuple[str, str], Optional[str]] = {}
+        self._title: Optional[_Collector] = None
+        self._h1: Optional[_Collector] = None
+        self._open: List[_Collector] = []
+        self._hours: List[_Collector] = []
+        self._text = ''
+        self._any_text = False
+        self.opening: Optional[str] = None if 'opening_hours' in self.needs else ''
+        self.phone: Optional[str] = None if 'phone' in self.needs else ''
+        self._closed = False
+
+    # lxml parser target interface
+
+    def start(self, tag: Any, attrib: Dict[str, str]) -> None:
+        self._flush()
+        if not isinstance(tag, str):
+            return
+        if tag == 'body':
+            self._in_head = False
+        elif tag == 'meta' and self._in_head:
+            for sels in META_FIELDS.values():
+                for attr, val in sels:
+                    if attrib.get(attr) == val and (attr, val) not in self._meta:
+                        self._meta[(attr, val)] = attrib.get('content')
+        self._stack.append(tag)
+        depth = len(self._stack)
+        kind = tag if tag in _NON_TEXT else ''
+        if kind:
+            self._containers.append(tag)
+        if tag == 'title' and self._title is None:
+            self._title = _Collector(depth, kind)
+            self._open.append(self._title)
+        elif tag == 'h1' and self._h1 is None:
+            self._h1 = _Collector(depth, kind)
+            self._open.append(self._h1)
+        if self.opening is None and attrib.get('itemprop') == 'openingHours':
+            c = _Collector(depth, kind)
+            self._hours.append(c)
+            self._open.append(c)
+
+    def end(self, tag: Any) -> None:
+        self._flush()
+        if not isinstance(tag, str) or not self._stack:
+            return
+        if tag == 'head':
+            self._in_head = False
+        depth = len(self._stack)
+        if self._stack.pop() in _NON_TEXT:
+            self._containers.pop()
+        if self._open and self._open[-1].depth == depth:
+            while self._open and self._open[-1].depth == depth:
+                self._open.pop().closed = True
+            self._resolve_hours()
+
+    def data(self, data: str) -> None:
+        self._buf.append(data)
+
+    def comment(self, text: str) -> None:
+        self._flush()
+
+    def pi(self, target: str, data: Optional[str] = None) -> None:
+        self._flush()
+
+    def close(self) -> None:
+        self._flush()
+
+    # extraction
+
+    def _flush(self) -> None:
+        if not self._buf:
+            return
+        s = ''.join(self._buf).strip()
+        self._buf.clear()
+        if not s:
+            return
+        kind = self._containers[-1] if self._containers else ''
+        for c in self._open:
+            if c.kind == kind:
+                c.parts.append(s)
+        if self.phone is None and not kind:
+            self._text += (' ' + s) if self._any_text else s
+            self._any_text = True
+            self._scan_phone(final=False)
+
+    def _scan_phone(self, final: bool) -> None:
+        m = PHONE_RE.search(self._text)
+        if m is not None and (final or m.end() < len(self._text)):
+            self.phone = m.group(0)
+            self._text = ''
+        elif m is not None:
+            self._text = self._text[m.start():]
+        else:
+            tail = _PHONE_TAIL_RE.search(self._text)
+            self._text = self._text[tail.start():] if tail else ''  # type: ignore[union-attr]
+            if final:
+                self.phone = ''
+
+    def _resolve_hours(self) -> None:
+        while self.opening is None and self._hours:
+            first = self._hours[0]
+            if not first.closed:
+                return
+            if first.text:
+                self.opening = first.text
+                self._hours.clear()
+                return
+            self._hours.pop(0)
+
+    def _meta_value(self, field: str) -> str:
+        for sel in META_FIELDS[field]:
+            val = self._meta.get(sel)
+            if val:
+                return val
+        return ''
+
+    def _fallback_title(self, final: bool) -> Optional[str]:
+        # First <title> if it has text, else the first <h1>; None while still undecided
+        # (a page without a <title> in <head> may still have one in the body, e.g. in an <svg>)
+        if self._title is not None and self._title.closed and self._title.text:
+            return self._title.text
+        if final:
+            return self._h1.text if self._h1 is not None else ''
+        if self._title is not None and self._title.closed and self._h1 is not None and self._h1.closed:
+            return self._h1.text
+        return None
+
+    def done(self) -> bool:
+        if self._closed:
+            return True
+        if self._in_head or self.opening is None or self.phone is None:
+            return False
+        return bool(self._meta_value('title')) or self._fallback_title(final=False) is not None
+
+    def feed(self, html: str) -> bool:
+        """Parse the next chunk; returns True once the result can no longer change."""
+        if not self._closed and html:
+            try:
+                self._parser.feed(html)
+            except etree.LxmlError:
+                # Unparseable from here on: keep what was found so far
+                self.result()
+        return self.done()
+
+    def result(self) -> Dict[str, str]:
+        """Finish parsing (if not done yet) and return the non-empty fields."""
+        if not self._closed:
+            try:
+                self._parser.close()
+            except etree.LxmlError:
+                pass
+            self._closed = True
+            self._in_head = False
+            self._resolve_hours()
+            if self.opening is None:
+                self.opening = ''
+            if self.phone is None:
+                self._scan_phone(final=True)
+        info = {
+            'title': self._meta_value('title') or self._fallback_title(final=True) or '',
+            'description': self._meta_value('description'),
+            'image': self._meta_value('image'),
+            'opening_hours': self.opening or '',
+            'phone': self.phone or '',
+        }
+        return {k: v for k, v in info.items() if v}
+
+
+def extract_meta(html: str, needs: Iterable[str] = BODY_FIELDS) -> Dict[str, str]:
+    """One-shot extraction of a whole page with MetaExtractor."""
+    ex = MetaExtractor(needs)
+    ex.feed(html)
+    return ex.result()
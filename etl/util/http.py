@@ -0,0 +1,350 @@
+import asyncio
+import contextlib
+import os
+import socket
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import brotli  # type: ignore  # noqa: F401  (lets urllib3 decode "br")
+    _HAS_BROTLI = True
+except Exception:
+    try:
+        import brotlicffi  # type: ignore  # noqa: F401
+        _HAS_BROTLI = True
+    except Exception:
+        _HAS_BROTLI = False
+
+DEFAULT_USER_AGENT = "LawnmoverBot/0.1 (+https://github.com/perwinroth/lawnmover)"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Extra counters for the current context (see counting()); thread pools must copy the context
+_scope: ContextVar[Optional[Dict[str, float]]] = ContextVar("http_scope", default=None)
+
+
+@contextlib.contextmanager
+def counting(counters: Dict[str, float]) -> Iterator[Dict[str, float]]:
+    """Also add requests/errors/bytes/latency of requests made in this context to `counters`.
+
+    Used to attribute HTTP traffic to one ETL stage. Work handed to other threads is only
+    counted if it runs in a copy of this context (contextvars.copy_context().run).
+    """
+    token = _scope.set(counters)
+    try:
+        yield counters
+    finally:
+        _scope.reset(token)
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` requests per second with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _host(url: str) -> str:
+    try:
+        return urlparse(url).netloc.lower()
+    except Exception:
+        return ""
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    val = resp.headers.get("Retry-After")
+    if not val:
+        return None
+    try:
+        return float(val)
+    except ValueError:
+        return None
+
+
+class HostPacer:
+    """Async per-host pacing: requests to a host start at least 1/rate seconds apart.
+
+    The rate is the shared client's HTTP_RATE_LIMITS/HTTP_HOST_RATE setting for the host;
+    `min_interval` adds a floor for hosts without one.
+    """
+
+    def __init__(self, min_interval: float = 0.0) -> None:
+        self.min_interval = min_interval
+        self.next_at: Dict[str, float] = {}
+
+    async def wait(self, url: str) -> None:
+        rate = get_client().rate_for(url)
+        interval = max(1.0 / rate if rate else 0.0, self.min_interval)
+        if not interval:
+            return
+        host = _host(url)
+        now = time.monotonic()
+        at = max(now, self.next_at.get(host, now))
+        self.next_at[host] = at + interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+class _AbortableAdapter(HTTPAdapter):
+    # Pools whose connections register with the owning session once connected
+    def __init__(self, owner: "AbortableSession", **kwargs: Any):
+        self._owner = owner
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        owner = self._owner
+
+        def tracked(base: Any) -> Any:
+            class Tracked(base):  # type: ignore[misc, valid-type]
+                def connect(self) -> None:
+                    super().connect()
+                    owner._opened(self)
+            return Tracked
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("AbortableHTTPPool", (HTTPConnectionPool,), {"ConnectionCls": tracked(HTTPConnection)}),
+            "https": type("AbortableHTTPSPool", (HTTPSConnectionPool,), {"ConnectionCls": tracked(HTTPSConnection)}),
+        }
+
+
+class AbortableSession(requests.Session):
+    """A requests.Session whose requests can be aborted from another thread.
+
+    abort() shuts down the sockets of all the session's connections, so a request blocked
+    waiting for a response fails right away with a ConnectionError, and so does any
+    request that connects afterwards. Used to cancel the losing one of two raced requests.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self._conns: List[Any] = []
+        self.aborted = False
+        adapter = _AbortableAdapter(self)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def _opened(self, conn: Any) -> None:
+        with self._lock:
+            self._conns.append(conn)
+            aborted = self.aborted
+        if aborted:
+            _shutdown(conn)
+
+    def abort(self) -> None:
+        with self._lock:
+            self.aborted = True
+            conns = list(self._conns)
+        for conn in conns:
+            _shutdown(conn)
+        self.close()
+
+
+def _shutdown(conn: Any) -> None:
+    sock = getattr(conn, "sock", None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class HttpClient:
+    """Shared HTTP client for all ETL fetchers.
+
+    One keep-alive connection pool per host (requests.Session), gzip/deflate and, when the
+    brotli package is installed, br decoding, per-host token-bucket rate limits, retry with
+    exponential backoff on connection errors and 429/5xx (honouring Retry-After), and
+    per-host request/byte/latency counters.
+    """
+
+    def __init__(
+        self,
+        user_agent: str = DEFAULT_USER_AGENT,
+        retries: int = 2,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        pool_maxsize: int = 10,
+        default_rate: Optional[float] = None,
+        rate_limits: Optional[Dict[str, float]] = None,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.default_rate = default_rate
+        self.rate_limits = {h.lower(): r for h, r in (rate_limits or {}).items()}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=50, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": user_agent,
+            "Accept-Encoding": "gzip, deflate, br" if _HAS_BROTLI else "gzip, deflate",
+        })
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _bucket(self, host: str) -> Optional[TokenBucket]:
+        with self._lock:
+            if host not in self._buckets:
+                rate = self.rate_limits.get(host, self.default_rate)
+                self._buckets[host] = TokenBucket(rate) if rate else None
+            return self._buckets[host]
+
+    def _count(self, host: str, **deltas: float) -> None:
+        scope = _scope.get()
+        with self._lock:
+            st = self._stats.setdefault(host, {"requests": 0, "errors": 0, "bytes": 0, "latency_s": 0.0})
+            for k, v in deltas.items():
+                st[k] += v
+                if scope is not None:
+                    scope[k] = scope.get(k, 0) + v
+
+    def record(self, url: str, **deltas: float) -> None:
+        """Count a request made outside this client (e.g. with aiohttp) in the per-host stats."""
+        self._count(_host(url), **deltas)
+
+    def rate_for(self, url: str) -> Optional[float]:
+        """Configured requests/second for the URL's host (None: unlimited)."""
+        host = _host(url)
+        return self.rate_limits.get(host, self.default_rate)
+
+    def _count_stream(self, host: str, resp: requests.Response) -> None:
+        # Count body bytes of streamed responses as they are read
+        orig = resp.iter_content
+
+        def counted(*args: Any, **kwargs: Any):
+            for chunk in orig(*args, **kwargs):
+                self._count(host, bytes=len(chunk))
+                yield chunk
+
+        resp.iter_content = counted  # type: ignore[method-assign]
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        retries: Optional[int] = None,
+        timeout: Any = 30,
+        session: Optional[requests.Session] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """Send a request; like requests.request() but pooled, rate limited, retried and counted.
+
+        Responses with an error status are returned (call raise_for_status() as usual) once
+        retries are exhausted. Pass retries=0 when the caller runs its own retry policy.
+        `session` (see abortable_session()) is used instead of the shared pool.
+        """
+        host = _host(url)
+        bucket = self._bucket(host)
+        attempts = (self.retries if retries is None else retries) + 1
+        for attempt in range(attempts):
+            if bucket is not None:
+                bucket.acquire()
+            started = time.monotonic()
+            try:
+                resp = (session or self.session).request(method, url, timeout=timeout, **kwargs)
+            except requests.RequestException:
+                self._count(host, requests=1, errors=1, latency_s=time.monotonic() - started)
+                if attempt + 1 >= attempts:
+                    raise
+                time.sleep(min(self.max_backoff, self.backoff * (2 ** attempt)))
+                continue
+            self._count(host, requests=1, latency_s=time.monotonic() - started, errors=1 if resp.status_code >= 400 else 0)
+            if kwargs.get("stream"):
+                self._count_stream(host, resp)
+            else:
+                self._count(host, bytes=len(resp.content))
+            if resp.status_code in RETRY_STATUSES and attempt + 1 < attempts:
+                wait = _retry_after(resp) or self.backoff * (2 ** attempt)
+                resp.close()
+                time.sleep(min(self.max_backoff, wait))
+                continue
+            return resp
+        raise RuntimeError("unreachable")
+
+    def abortable_session(self) -> AbortableSession:
+        """A separate AbortableSession with this client's default headers, for request(session=...)."""
+        sess = AbortableSession()
+        sess.headers.update(self.session.headers)
+        return sess
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {h: dict(st) for h, st in self._stats.items()}
+
+    def report(self) -> str:
+        lines = []
+        for host, st in sorted(self.stats().items(), key=lambda kv: -kv[1]["requests"]):
+            avg = st["latency_s"] / st["requests"] if st["requests"] else 0.0
+            lines.append(
+                f"{host}: requests={int(st['requests'])} errors={int(st['errors'])} "
+                f"bytes={int(st['bytes'])} avg_latency={avg:.2f}s"
+            )
+        return "\n".join(lines)
+
+
+def _parse_rate_limits(val: str) -> Dict[str, float]:
+    # "overpass-api.de=0.5,www.elgiganten.se=1"
+    out: Dict[str, float] = {}
+    for part in val.split(","):
+        host, _, rate = part.partition("=")
+        if host.strip() and rate.strip():
+            try:
+                out[host.strip()] = float(rate)
+            except ValueError:
+                continue
+    return out
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Return the process-wide client, configured from HTTP_* environment variables on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            default_rate = os.environ.get("HTTP_HOST_RATE", "").strip()
+            _client = HttpClient(
+                retries=int(os.environ.get("HTTP_RETRIES", "2")),
+                default_rate=float(default_rate) if default_rate else None,
+                rate_limits=_parse_rate_limits(os.environ.get("HTTP_RATE_LIMITS", "")),
+            )
+        return _client
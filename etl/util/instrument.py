@@ -0,0 +1,140 @@
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .http import counting, get_client
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class StageStats:
+    """Measurements for one ETL stage; set items_out (and items_in) from inside the stage."""
+
+    __slots__ = ("name", "started_at", "wall_s", "cpu_s", "items_in", "items_out", "http", "error", "profile", "resumed")
+
+    def __init__(self, name: str, items_in: Optional[int] = None):
+        self.name = name
+        self.started_at = _now()
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.items_in = items_in
+        self.items_out: Optional[int] = None
+        self.http: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.profile: Optional[str] = None
+        self.resumed = False  # output came from a checkpoint
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "wall_s": round(self.wall_s, 3),
+            "cpu_s": round(self.cpu_s, 3),
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "http_requests": int(self.http.get("requests", 0)),
+            "http_errors": int(self.http.get("errors", 0)),
+            "http_bytes": int(self.http.get("bytes", 0)),
+            "http_latency_s": round(self.http.get("latency_s", 0.0), 3),
+            "error": self.error,
+            "profile": self.profile,
+            "resumed": self.resumed,
+        }
+
+
+class RunReport:
+    """Collect per-stage timings and counters for one ETL run and write them as JSON.
+
+    cpu_s is the CPU time of the thread running the stage (stages may run concurrently);
+    HTTP counters include requests from threads that run in a copy of the stage's context.
+    With `profile_dir`, each stage also runs under cProfile and dumps <stage>.pstats there
+    (plus a short <stage>.txt of the top functions by cumulative time).
+    """
+
+    def __init__(self, profile_dir: str = ""):
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.started_at = _now()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._lock = threading.Lock()
+        self.stages: List[StageStats] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str, items_in: Optional[int] = None) -> Iterator[StageStats]:
+        st = StageStats(name, items_in)
+        with self._lock:
+            self.stages.append(st)
+        prof = self._start_profile(name)
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            with counting(st.http):
+                yield st
+        except Exception as e:
+            st.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            st.wall_s = time.perf_counter() - wall
+            st.cpu_s = time.thread_time() - cpu
+            if prof is not None:
+                prof.disable()
+                st.profile = self._dump_profile(name, prof)
+
+    def _start_profile(self, name: str) -> Optional[cProfile.Profile]:
+        if self.profile_dir is None:
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError as e:
+            # Some Python versions allow only one active profiler per process
+            print(f"Not profiling stage {name}: {e}", file=sys.stderr)
+            return None
+        return prof
+
+    def _dump_profile(self, name: str, prof: cProfile.Profile) -> str:
+        assert self.profile_dir is not None
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.profile_dir / f"{name}.pstats"
+        prof.dump_stats(str(path))
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(30)
+        (self.profile_dir / f"{name}.txt").write_text(out.getvalue(), encoding="utf-8")
+        return str(path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = [st.to_dict() for st in self.stages]
+        return {
+            "started_at": self.started_at,
+            "finished_at": _now(),
+            "wall_s": round(time.perf_counter() - self._wall, 3),
+            "cpu_s": round(time.process_time() - self._cpu, 3),
+            "stages": stages,
+            "http_hosts": get_client().stats(),
+        }
+
+    def write(self, path: str) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def summary(self) -> str:
+        lines = []
+        for st in self.stages:
+            d = st.to_dict()
+            items = f"{d['items_in'] if d['items_in'] is not None else '-'}->{d['items_out'] if d['items_out'] is not None else '-'}"
+            lines.append(
+                f"{d['name']}: wall={d['wall_s']:.2f}s cpu={d['cpu_s']:.2f}s items={items} "
+                f"http={d['http_requests']} ({d['http_bytes']} B){' resumed' if d['resumed'] else ''}"
+                f"{' ERROR ' + d['error'] if d['error'] else ''}"
+            )
+        return "\n".join(lines)
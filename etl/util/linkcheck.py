@@ -1,41 +1,172 @@
 import asyncio
+import gzip
+import json
+import os
 import time
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import Callable, List, Dict, Any, Iterable, Optional
 
 import aiohttp
 
+from .http import HostPacer, get_client
+from .schedule import plan
+from .urls import canonical_url, url_domain, url_key
+
+USER_AGENT = "LawnmoverLinkCheck/0.1 (+https://github.com/perwinroth/lawnmover)"
+
+# Entries not checked for this long are dropped on save
+FORGET_AFTER_S = 90 * 86400
+
+
+def link_result(url: str, status: Optional[int], final: Optional[str]) -> Dict[str, Any]:
+    """Link check record for a response (status None if there was none)."""
+    return {"url": url, "ok": status is not None and 200 <= status < 400, "status": status, "final": final}
+
+
+class LinkCache:
+    """Link check results by url_key(), kept between runs.
+
+    A result is reused for `ok_ttl_s` if the link worked. A broken link is retried after
+    `fail_ttl_s`, doubling with each failure in a row up to `ok_ttl_s`, so it is retried
+    sooner without being rechecked every run forever. With path=None the cache lives only
+    in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None, ok_ttl_s: float = 14 * 86400, fail_ttl_s: float = 86400):
+        self.path = Path(path) if path else None
+        self.ok_ttl_s = ok_ttl_s
+        self.fail_ttl_s = fail_ttl_s
+        self.links: Dict[str, Dict[str, Any]] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                    self.links = json.load(f).get('links', {})
+            except (OSError, ValueError):
+                self.links = {}
+
+    def latest(self, key: str) -> Optional[Dict[str, Any]]:
+        """Last result for the key, however old."""
+        entry = self.links.get(key)
+        return entry['data'] if entry else None
+
+    def due(self, keys: Iterable[str]) -> List[str]:
+        """Keys to check now, never checked first, then longest overdue (see schedule.plan())."""
+        return plan(keys, self._record, self.ok_ttl_s, self.fail_ttl_s)
+
+    def _record(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.links.get(key)
+        if entry is None:
+            return None
+        return {'at': entry.get('at'), 'ok': bool(entry['data'].get('ok')), 'fails': entry.get('fails', 0)}
+
+    def put(self, key: str, data: Dict[str, Any]) -> None:
+        prev = self.links.get(key) or {}
+        fails = 0 if data.get('ok') else int(prev.get('fails') or 0) + 1
+        self.links[key] = {'at': time.time(), 'data': data, 'fails': fails}
+
+    def results(self) -> Iterable[Dict[str, Any]]:
+        for entry in self.links.values():
+            yield entry['data']
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        cutoff = time.time() - FORGET_AFTER_S
+        self.links = {k: e for k, e in self.links.items() if e.get('at', 0) >= cutoff}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump({'version': 1, 'links': self.links}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
 
 async def _check_one(session: aiohttp.ClientSession, url: str, timeout: int = 10) -> Dict[str, Any]:
-    out: Dict[str, Any] = {"url": url, "ok": False, "status": None, "final": None}
+    client = get_client()
+    out = link_result(url, None, None)
+    started = time.monotonic()
     try:
-        async with session.head(url, allow_redirects=True, timeout=timeout) as resp:
-            out["status"] = resp.status
-            out["final"] = str(resp.url)
-            if 200 <= resp.status < 400:
-                out["ok"] = True
-                return out
+        async with session.head(url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            out = link_result(url, resp.status, str(resp.url))
+        client.record(url, requests=1, latency_s=time.monotonic() - started)
+        if out["ok"]:
+            return out
     except Exception:
-        pass
-    # Try GET as fallback
+        client.record(url, requests=1, errors=1, latency_s=time.monotonic() - started)
+    # Try GET as fallback (some servers refuse HEAD); the body is not read
+    started = time.monotonic()
     try:
-        async with session.get(url, allow_redirects=True, timeout=timeout) as resp:
-            out["status"] = resp.status
-            out["final"] = str(resp.url)
-            out["ok"] = 200 <= resp.status < 400
-            return out
+        async with session.get(url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            out = link_result(url, resp.status, str(resp.url))
+        client.record(url, requests=1, latency_s=time.monotonic() - started, errors=0 if out["ok"] else 1)
     except Exception:
-        return out
+        client.record(url, requests=1, errors=1, latency_s=time.monotonic() - started)
+    return out
+
+
+async def _run(
+    urls: List[str],
+    concurrency: int,
+    per_host: int,
+    host_delay_s: float,
+    budget_s: Optional[float],
+    on_result: Optional[Callable[[Dict[str, Any]], None]],
+) -> Dict[str, Dict[str, Any]]:
+    # One lane per host connection: a host's URLs go through its lanes one at a time (paced),
+    # while the global semaphore is handed around all hosts' lanes in turn, so one big host
+    # can neither be hammered nor keep the others waiting
+    by_host: Dict[str, List[str]] = {}
+    for u in urls:
+        by_host.setdefault(url_domain(u), []).append(u)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    pacer = HostPacer(host_delay_s)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget_s if budget_s else None
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async def lane(session: aiohttp.ClientSession, queue: List[str]) -> None:
+        while queue:
+            u = queue.pop()
+            await pacer.wait(u)
+            async with sem:
+                if deadline is not None and loop.time() >= deadline:
+                    # Out of budget: checks already running finish, nothing new starts
+                    return
+                res = await _check_one(session, u)
+            results[u] = res
+            if on_result is not None:
+                on_result(res)
 
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    async with aiohttp.ClientSession(connector=connector, headers={"User-Agent": USER_AGENT}) as session:
+        lanes = []
+        for host_urls in by_host.values():
+            queue = list(reversed(host_urls))
+            lanes.extend(lane(session, queue) for _ in range(min(max(1, per_host), len(host_urls))))
+        await asyncio.gather(*lanes)
+    return results
 
-async def _run(urls: List[str], concurrency: int = 10) -> List[Dict[str, Any]]:
-    connector = aiohttp.TCPConnector(limit=concurrency)
-    headers = {"User-Agent": "LawnmoverLinkCheck/0.1 (+https://github.com/perwinroth/lawnmover)"}
-    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
-        tasks = [asyncio.create_task(_check_one(session, u)) for u in urls]
-        return await asyncio.gather(*tasks)
 
+def check_links(
+    urls: List[str],
+    concurrency: int = 10,
+    per_host: int = 2,
+    host_delay_s: float = 0.5,
+    budget_s: Optional[float] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Check that URLs answer (HEAD, falling back to GET); one result per checked input URL.
 
-def check_links(urls: List[str], concurrency: int = 10) -> List[Dict[str, Any]]:
+    URLs that are the same page in canonical form (url_key()) are checked once. At most
+    `concurrency` checks run at a time, at most `per_host` per host and each host's
+    requests start at least `host_delay_s` apart (or slower, per HTTP_RATE_LIMITS). Each
+    host's URLs are checked in input order. With `budget_s`, no check starts after that
+    many seconds, so the result can miss URLs. `on_result` is called with each result as
+    soon as it is in.
+    """
     if not urls:
         return []
-    return asyncio.run(_run(urls, concurrency=concurrency))
+    unique: Dict[str, str] = {}
+    for u in urls:
+        unique.setdefault(url_key(u), canonical_url(u))
+    done = asyncio.run(_run(list(unique.values()), concurrency, per_host, host_delay_s, budget_s, on_result))
+    return [dict(done[unique[url_key(u)]], url=u) for u in urls if unique[url_key(u)] in done]
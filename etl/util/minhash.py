@@ -0,0 +1,70 @@
+import zlib
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+Signature = Tuple[int, ...]
+
+_MASK32 = 0xFFFFFFFF
+
+
+def minhash(shingles: Iterable[str], num_bins: int = 100) -> Signature:
+    """One-permutation MinHash: one CRC32 per shingle, split into `num_bins` bins.
+
+    Each bin keeps its minimum; empty bins borrow from the next non-empty bin to the
+    right (rotation densification), so two sets agree on a bin with probability close to
+    their Jaccard similarity, at the cost of one hash per shingle instead of one per
+    shingle and permutation. Empty input gives an empty signature.
+    """
+    bins = [_MASK32 + 1] * num_bins
+    for s in shingles:
+        h = zlib.crc32(s.encode('utf-8'))
+        b = h % num_bins
+        v = h // num_bins
+        if v < bins[b]:
+            bins[b] = v
+    if all(v > _MASK32 for v in bins):
+        return ()
+    out = list(bins)
+    for i in range(num_bins):
+        if bins[i] > _MASK32:
+            j, dist = i, 0
+            while bins[j] > _MASK32:
+                j = (j + 1) % num_bins
+                dist += 1
+            out[i] = bins[j] + dist * (_MASK32 + 1)
+    return tuple(out)
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures: `bands` x `rows` must equal the signature length.
+
+    Keys sharing all rows of any band are candidates. 20 bands of 5 rows find pairs with
+    Jaccard similarity 0.6 about 80% of the time and 0.8 almost always, while pairs at 0.3
+    collide only ~5% of the time (50% point: (1/20)^(1/5) = 0.55). Buckets stop
+    growing at `max_bucket` entries so very common names can't make lookups quadratic.
+    """
+
+    def __init__(self, bands: int = 20, rows: int = 5, max_bucket: int = 50):
+        self.bands = bands
+        self.rows = rows
+        self.max_bucket = max_bucket
+        self.buckets: Dict[Tuple[int, Signature], List[Hashable]] = {}
+
+    def _bands(self, sig: Signature) -> Iterable[Tuple[int, Signature]]:
+        for b in range(self.bands):
+            yield b, sig[b * self.rows:(b + 1) * self.rows]
+
+    def add(self, key: Hashable, sig: Signature) -> None:
+        if not sig:
+            return
+        for band in self._bands(sig):
+            bucket = self.buckets.setdefault(band, [])
+            if len(bucket) < self.max_bucket:
+                bucket.append(key)
+
+    def query(self, sig: Signature) -> Set[Hashable]:
+        out: Set[Hashable] = set()
+        if not sig:
+            return out
+        for band in self._bands(sig):
+            out.update(self.buckets.get(band, ()))
+        return out
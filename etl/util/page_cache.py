@@ -0,0 +1,86 @@
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+# Entries not revalidated for this long are dropped on save
+FORGET_AFTER_S = 90 * 86400
+
+
+class PageCache:
+    """HTTP validators (ETag / Last-Modified) and the extraction made from each page, by URL key.
+
+    Pages are keyed by urls.url_key() (or any other stable key the caller uses). headers()
+    gives the conditional headers for a page; after a 304 the stored extraction is reused
+    instead of downloading and parsing the page again. Entries are tagged with the
+    extractor `version`, so changing the extraction logic invalidates them, and with the
+    `fields` the extraction looked for: a page is only revalidated when its stored
+    extraction covers the fields wanted now. With path=None the cache lives only in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None, version: int = 1):
+        self.path = Path(path) if path else None
+        self.version = version
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                    self.pages = json.load(f).get('pages', {})
+            except (OSError, ValueError):
+                self.pages = {}
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        entry = self.pages.get(url)
+        if entry is None or entry.get('version') != self.version:
+            return None
+        return entry
+
+    def headers(self, url: str, fields: Iterable[str] = ()) -> Dict[str, str]:
+        entry = self.get(url)
+        if entry is None or not set(fields) <= set(entry.get('fields') or ()):
+            return {}
+        out = {}
+        if entry.get('etag'):
+            out['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            out['If-Modified-Since'] = entry['last_modified']
+        return out
+
+    def put(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        data: Dict[str, Any],
+        fields: Iterable[str] = (),
+    ) -> None:
+        if not etag and not last_modified:
+            # Nothing to revalidate with
+            self.pages.pop(url, None)
+            return
+        self.pages[url] = {
+            'version': self.version,
+            'etag': etag,
+            'last_modified': last_modified,
+            'data': data,
+            'fields': sorted(fields),
+            'at': time.time(),
+        }
+
+    def touch(self, url: str) -> None:
+        entry = self.pages.get(url)
+        if entry is not None:
+            entry['at'] = time.time()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        cutoff = time.time() - FORGET_AFTER_S
+        self.pages = {u: e for u, e in self.pages.items() if e.get('at', 0) >= cutoff}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump({'version': 1, 'pages': self.pages}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
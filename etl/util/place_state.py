@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .schedule import plan
+
+# Entries for places that have not been seen for this long are dropped on save
+FORGET_AFTER_S = 90 * 86400
+
+
+def place_key(p: Dict[str, Any]) -> str:
+    return str(p.get('id') or p.get('website') or '')
+
+
+def content_hash(p: Dict[str, Any]) -> str:
+    # Hash the place as the sources produced it (call before enrichment mutates it)
+    return hashlib.sha256(json.dumps(p, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+class PlaceState:
+    """Per-place results of network stages (enrichment, link checks) kept between runs.
+
+    Each entry records the content hash of the place as the sources produced it and, per
+    kind, the last result, when it was fetched and how many fetches in a row failed.
+    observe() (called on the deduped places, before enrichment) drops results of places
+    whose source data changed; due() lists the places to (re)fetch: never fetched or
+    changed first, then expired ones, longest overdue first. With path=None the state
+    lives only in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.places: Dict[str, Dict[str, Any]] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                    self.places = json.load(f).get('places', {})
+            except (OSError, ValueError):
+                # Corrupt state only costs a full refetch
+                self.places = {}
+
+    def observe(self, places: Iterable[Dict[str, Any]]) -> int:
+        """Record the current source hash of each place; returns how many are new or changed."""
+        now = time.time()
+        changed = 0
+        for p in places:
+            key = place_key(p)
+            if not key:
+                continue
+            h = content_hash(p)
+            entry = self.places.get(key)
+            if entry is None or entry.get('hash') != h:
+                entry = self.places[key] = {'hash': h}
+                changed += 1
+            entry['seen'] = now
+        return changed
+
+    def get(self, p: Dict[str, Any], kind: str) -> Optional[Dict[str, Any]]:
+        """Return the last {'at', 'ok', 'data'} record of `kind` for this place, if any."""
+        return self.places.get(place_key(p), {}).get(kind)
+
+    def put(self, p: Dict[str, Any], kind: str, data: Dict[str, Any], ok: bool = True) -> None:
+        entry = self.places.setdefault(place_key(p), {'seen': time.time()})
+        prev = entry.get(kind) or {}
+        # A failed fetch keeps the previous data but still counts as an attempt
+        entry[kind] = {'at': time.time(), 'ok': ok, 'data': data if ok else prev.get('data', {})}
+        if not ok:
+            entry[kind]['fails'] = int(prev.get('fails') or 0) + 1
+
+    def due(
+        self,
+        places: Iterable[Dict[str, Any]],
+        kind: str,
+        ttl_s: float,
+        fail_ttl_s: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Places to (re)fetch in priority order (see schedule.plan()); failures back off from `fail_ttl_s`."""
+        return plan(places, lambda p: self.get(p, kind), ttl_s, fail_ttl_s)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        cutoff = time.time() - FORGET_AFTER_S
+        self.places = {k: v for k, v in self.places.items() if v.get('seen', 0) >= cutoff}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump({'version': 1, 'places': self.places}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
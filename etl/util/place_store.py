@@ -0,0 +1,183 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .geohash import encode as geohash_encode, prefix_range
+from .urls import url_domain
+
+GEOHASH_PRECISION = 7
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    name TEXT,
+    website TEXT,
+    domain TEXT,
+    geohash TEXT,
+    lat REAL,
+    lon REAL,
+    categories TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS places_domain ON places (domain);
+CREATE INDEX IF NOT EXISTS places_geohash ON places (geohash);
+CREATE INDEX IF NOT EXISTS places_id ON places (id);
+CREATE TABLE IF NOT EXISTS place_categories (
+    category TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (category, seq)
+) WITHOUT ROWID;
+"""
+
+# Columns that can be selected with query(); `data` is the full place as JSON
+COLUMNS = ('seq', 'id', 'name', 'website', 'domain', 'geohash', 'lat', 'lon', 'categories', 'data')
+
+
+def _row(seq: int, p: Dict[str, Any]) -> Tuple[Any, ...]:
+    lat, lon = p.get('lat'), p.get('lon')
+    gh = geohash_encode(lat, lon, GEOHASH_PRECISION) if lat is not None and lon is not None else None
+    website = p.get('website') or None
+    return (
+        seq, str(p.get('id') or f'place/{seq}'), p.get('name'), website, url_domain(website or '') or None,
+        gh, lat, lon, json.dumps(p.get('categories') or [], ensure_ascii=False), json.dumps(p, ensure_ascii=False),
+    )
+
+
+class PlaceStore:
+    """SQLite store of the ETL's final places (data/places.sqlite by default).
+
+    Places are written in batched transactions and read back as a stream, optionally
+    filtered by category, domain, geohash prefix or bbox, so tools don't have to load and
+    parse the whole dataset. The database runs in WAL mode so readers are never blocked
+    by a running writer. Rows keep the order they were written in (`seq`).
+    """
+
+    def __init__(self, path: str, batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> 'PlaceStore':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _insert(self, batch: List[Tuple[Any, ...]]) -> None:
+        self.conn.executemany(
+            'INSERT INTO places (seq, id, name, website, domain, geohash, lat, lon, categories, data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            batch,
+        )
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO place_categories (category, seq) VALUES (?, ?)',
+            [(c, row[0]) for row in batch for c in json.loads(row[8])],
+        )
+
+    def _delete_ids(self, ids: List[Tuple[str]]) -> None:
+        self.conn.executemany('DELETE FROM place_categories WHERE seq IN (SELECT seq FROM places WHERE id = ?)', ids)
+        self.conn.executemany('DELETE FROM places WHERE id = ?', ids)
+
+    def _batches(self, places: Iterable[Dict[str, Any]], start: int) -> Iterator[List[Tuple[Any, ...]]]:
+        batch: List[Tuple[Any, ...]] = []
+        for n, p in enumerate(places, start):
+            batch.append(_row(n, p))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def upsert(self, places: Iterable[Dict[str, Any]]) -> int:
+        """Replace places with the same id (or append new ones) after existing rows, committing per batch."""
+        (last,) = self.conn.execute('SELECT COALESCE(MAX(seq), -1) FROM places').fetchone()
+        n = 0
+        for batch in self._batches(places, last + 1):
+            with self.conn:
+                self._delete_ids([(row[1],) for row in batch])
+                self._insert(batch)
+            n += len(batch)
+        return n
+
+    def replace_all(self, places: Iterable[Dict[str, Any]]) -> int:
+        """Replace the store's contents with `places` in one transaction (readers see old or new, never a mix).
+
+        Duplicate ids are kept as separate rows, like in places.json.
+        """
+        n = 0
+        with self.conn:
+            self.conn.execute('DELETE FROM places')
+            self.conn.execute('DELETE FROM place_categories')
+            for batch in self._batches(places, 0):
+                self._insert(batch)
+                n += len(batch)
+        return n
+
+    def count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM places').fetchone()[0]
+
+    def get(self, place_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute('SELECT data FROM places WHERE id = ? ORDER BY seq LIMIT 1', (place_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(
+        self,
+        columns: Sequence[str] = ('data',),
+        category: Optional[str] = None,
+        domain: Optional[str] = None,
+        geohash_prefix: Optional[str] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        with_coords: bool = False,
+        source: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream rows as dicts of `columns` (see COLUMNS), in write order.
+
+        bbox is (min_lon, min_lat, max_lon, max_lat); source is a source name ('OSM', 'HAV', ...),
+        matched inside SQLite. `categories` and `data` are decoded from JSON.
+        """
+        bad = [c for c in columns if c not in COLUMNS]
+        if bad:
+            raise ValueError(f'Unknown place store columns: {bad}')
+        where: List[str] = []
+        args: List[Any] = []
+        if category:
+            where.append('seq IN (SELECT seq FROM place_categories WHERE category = ?)')
+            args.append(category)
+        if domain:
+            where.append('domain = ?')
+            args.append(url_domain(domain))
+        if geohash_prefix:
+            where.append('geohash >= ? AND geohash < ?')
+            args.extend(prefix_range(geohash_prefix))
+        if bbox:
+            where.append('lon BETWEEN ? AND ? AND lat BETWEEN ? AND ?')
+            args.extend([bbox[0], bbox[2], bbox[1], bbox[3]])
+        if with_coords:
+            where.append('lat IS NOT NULL AND lon IS NOT NULL')
+        if source:
+            where.append("json_extract(data, '$.source.name') = ?")
+            args.append(source)
+        sql = f"SELECT {', '.join(columns)} FROM places"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY seq'
+        for row in self.conn.execute(sql, args):
+            out = dict(zip(columns, row))
+            for k in ('categories', 'data'):
+                if k in out:
+                    out[k] = json.loads(out[k])
+            yield out
+
+    def iter_places(self, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """Stream full place dicts; takes the same filters as query()."""
+        for row in self.query(('data',), **filters):
+            yield row['data']
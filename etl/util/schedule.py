@@ -0,0 +1,49 @@
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+def next_due(rec: Optional[Dict[str, Any]], ttl_s: float, fail_ttl_s: float, max_backoff_s: float) -> float:
+    """When an item with last result `rec` ({'at', 'ok', 'fails'}) should be refetched.
+
+    Never fetched (or source changed, which drops the result): immediately. A success is
+    good for `ttl_s`; after `fails` failures in a row the item waits `fail_ttl_s` doubled
+    per further failure, up to `max_backoff_s`, so dead sites stop eating the budget but
+    are still retried.
+    """
+    if rec is None:
+        return -math.inf
+    at = float(rec.get('at') or 0.0)
+    if rec.get('ok', True):
+        return at + ttl_s
+    fails = max(1, int(rec.get('fails') or 1))
+    return at + min(fail_ttl_s * 2 ** min(fails - 1, 30), max_backoff_s)
+
+
+def plan(
+    items: Iterable[T],
+    record: Callable[[T], Optional[Dict[str, Any]]],
+    ttl_s: float,
+    fail_ttl_s: Optional[float] = None,
+    max_backoff_s: Optional[float] = None,
+    now: Optional[float] = None,
+) -> List[T]:
+    """Items due now, most overdue first.
+
+    New and changed items come first (in input order), then the rest by how long ago
+    they became due, so a fixed per-run budget works through all of them round-robin
+    across runs instead of redoing the head of the list. `fail_ttl_s` defaults to
+    `ttl_s` and `max_backoff_s` to `ttl_s`.
+    """
+    now = time.time() if now is None else now
+    fail_ttl_s = ttl_s if fail_ttl_s is None else fail_ttl_s
+    max_backoff_s = ttl_s if max_backoff_s is None else max_backoff_s
+    due = []
+    for n, item in enumerate(items):
+        at = next_due(record(item), ttl_s, fail_ttl_s, max_backoff_s)
+        if at <= now:
+            due.append((at, n, item))
+    due.sort(key=lambda t: (t[0], t[1]))
+    return [item for _, _, item in due]
@@ -0,0 +1,157 @@
+import posixpath
+import re
+from typing import Dict, Iterable, Optional
+from urllib.parse import quote, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok',
+}
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Session ids some CMSs put in the path (";jsessionid=...")
+_SESSION_RE = re.compile(r';(?:jsessionid|phpsessid|sid)=[^/?#]*', re.IGNORECASE)
+_PCT_RE = re.compile(r'%[0-9a-fA-F]{2}')
+_UNRESERVED = set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+# Characters left as they are when percent-encoding a path ('%' so existing escapes survive)
+_PATH_SAFE = "/:@!$&'()*+,;=-._~%"
+
+
+def _pct(m: 're.Match[str]') -> str:
+    # %xx escapes of unreserved characters are the character itself; the rest use uppercase hex
+    ch = chr(int(m.group(0)[1:], 16))
+    return ch if ch in _UNRESERVED else m.group(0).upper()
+
+
+def _host(netloc: str, scheme: str) -> str:
+    userinfo, _, hostport = netloc.rpartition('@')
+    host, port = hostport, ''
+    if hostport.startswith('['):
+        end = hostport.find(']')
+        host, port = hostport[:end + 1], hostport[end + 2:]
+    elif ':' in hostport:
+        host, port = hostport.rsplit(':', 1)
+    host = host.lower().rstrip('.')
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    if port and (not port.isdigit() or int(port) == DEFAULT_PORTS.get(scheme)):
+        port = ''
+    out = f'{host}:{port}' if port else host
+    return f'{userinfo}@{out}' if userinfo else out
+
+
+def _path(path: str) -> str:
+    path = _SESSION_RE.sub('', path)
+    path = re.sub(r'/{2,}', '/', path or '/')
+    norm = posixpath.normpath(path) if path != '/' else '/'
+    norm = '/' + norm.lstrip('/') if norm != '.' else '/'
+    norm = quote(norm, safe=_PATH_SAFE)
+    return _PCT_RE.sub(_pct, norm)
+
+
+def _query(query: str) -> str:
+    # Only drops parameters; the others keep their order and encoding
+    params = [
+        kv for kv in query.split('&')
+        if kv and kv.split('=', 1)[0].lower() not in TRACKING_PARAMS
+        and not kv.split('=', 1)[0].lower().startswith(TRACKING_PREFIXES)
+    ]
+    return '&'.join(params)
+
+
+def canonical_url(url: str) -> str:
+    """Normalized form of a website URL, still fetchable.
+
+    Adds https:// when the scheme is missing, lowercases scheme and host (IDNA-encoded),
+    drops default ports, fragments, session ids in the path and tracking parameters
+    (utm_*, fbclid, ...), resolves '.'/'..' and repeated slashes, strips a trailing slash
+    and normalizes percent-encoding. Non-http(s) URLs and empty strings are only stripped.
+    """
+    url = (url or '').strip()
+    if not url:
+        return ''
+    if '://' not in url and not url.startswith('//'):
+        if re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:(?!\d)', url):
+            return url  # mailto:, tel:, ...
+        url = 'https://' + url
+    try:
+        parts = urlsplit(url if not url.startswith('//') else 'https:' + url)
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url
+    path = _path(parts.path)
+    if path != '/':
+        path = path.rstrip('/')
+    return urlunsplit((scheme, _host(parts.netloc, scheme), path, _query(parts.query), ''))
+
+
+def url_key(url: str) -> str:
+    """Identity of a page for caches and dedupe: the canonical URL without scheme and 'www.'."""
+    c = canonical_url(url)
+    if '://' not in c:
+        return c
+    rest = c.split('://', 1)[1]
+    return rest[4:] if rest.startswith('www.') else rest
+
+
+def url_domain(url: str) -> str:
+    """Lowercased host of a website URL without 'www.' and port ('' if there is none)."""
+    try:
+        host = urlsplit(canonical_url(url)).hostname or ''
+    except ValueError:
+        return ''
+    return host[4:] if host.startswith('www.') else host
+
+
+class RedirectMap:
+    """Where URLs ended up after redirects, learned from link check results.
+
+    resolve() follows the learned redirects (by url_key) and returns the canonical final
+    URL, so a page reached through http://, www. or an old address gets one key. A
+    redirect from a deep link to the site's front page is not learned: that is usually a
+    removed page, not a new address for it.
+    """
+
+    def __init__(self) -> None:
+        self.targets: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def learn(self, url: str, final: Optional[str]) -> None:
+        if not url or not final:
+            return
+        src, dst = canonical_url(url), canonical_url(final)
+        if url_key(src) == url_key(dst):
+            return
+        if urlsplit(dst).path == '/' and urlsplit(src).path != '/':
+            return
+        self.targets[url_key(src)] = dst
+
+    def learn_all(self, results: Iterable[Dict[str, object]]) -> 'RedirectMap':
+        """Learn from link check records ({'url', 'ok', 'final', ...}); failed checks are skipped."""
+        for res in results:
+            if res.get('ok'):
+                self.learn(str(res.get('url') or ''), res.get('final'))  # type: ignore[arg-type]
+        return self
+
+    def resolve(self, url: str) -> str:
+        c = canonical_url(url)
+        seen = set()
+        key = url_key(c)
+        while key in self.targets and key not in seen:
+            seen.add(key)
+            c = self.targets[key]
+            key = url_key(c)
+        return c
+
+    def key(self, url: str) -> str:
+        """url_key() of the resolved URL."""
+        return url_key(self.resolve(url))
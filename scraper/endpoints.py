@@ -0,0 +1,231 @@
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import requests
+
+from etl.util.http import get_client
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    rate_limited: int = 0  # HTTP 429
+    gateway_timeouts: int = 0  # HTTP 504
+    consecutive_failures: int = 0
+    latency_ewma: Optional[float] = None
+    open_until: float = 0.0  # circuit breaker: skip endpoint until this time
+    cooldown: float = 0.0
+    retry_after: float = 0.0  # earliest time the server said we may retry
+    slots_checked_at: float = 0.0
+    slots_free: Optional[int] = None
+    slot_wait: float = 0.0
+    recent: Deque[float] = field(default_factory=lambda: deque(maxlen=50))  # successful latencies
+    hedged: int = 0  # times a backup request was sent because this endpoint was slow
+
+
+def status_url(endpoint: str) -> str:
+    # https://host/api/interpreter -> https://host/api/status
+    return re.sub(r"/interpreter/?$", "/status", endpoint)
+
+
+def parse_status(text: str) -> Dict[str, Any]:
+    """Parse the plain-text Overpass /api/status page into free slots and seconds until the next slot."""
+    out: Dict[str, Any] = {"slots_free": None, "wait": 0.0}
+    m = re.search(r"(\d+)\s+slots? available now", text)
+    if m:
+        out["slots_free"] = int(m.group(1))
+    waits = [int(x) for x in re.findall(r"Slot available after: [^,]+, in (-?\d+) seconds", text)]
+    if waits:
+        out["wait"] = float(max(0, min(waits)))
+        if out["slots_free"] is None:
+            out["slots_free"] = 0
+    return out
+
+
+class EndpointScheduler:
+    """Pick the healthiest Overpass endpoint for each request.
+
+    Tracks per-endpoint latency (EWMA), error counts and 429/504 responses, opens a circuit
+    breaker after repeated failures, and optionally consults /api/status for free query slots.
+    With `hedge_quantile` set (e.g. 0.9), callers may send a backup request when the primary
+    hasn't responded within that quantile of its past latencies (see hedge_delay()).
+    Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[str],
+        alpha: float = 0.3,
+        failure_threshold: int = 3,
+        base_cooldown: float = 60.0,
+        max_cooldown: float = 600.0,
+        check_status: bool = True,
+        status_ttl: float = 15.0,
+        hedge_quantile: Optional[float] = None,
+        hedge_min_delay: float = 5.0,
+        hedge_default_delay: float = 60.0,
+    ):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.check_status = check_status
+        self.status_ttl = status_ttl
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self._lock = threading.Lock()
+        self._stats: Dict[str, EndpointStats] = {ep: EndpointStats() for ep in endpoints}
+
+    def _get(self, ep: str) -> EndpointStats:
+        st = self._stats.get(ep)
+        if st is None:
+            st = self._stats[ep] = EndpointStats()
+        return st
+
+    def _refresh_status(self, ep: str, st: EndpointStats, now: float) -> None:
+        if not self.check_status or now - st.slots_checked_at < self.status_ttl:
+            return
+        st.slots_checked_at = now
+        try:
+            resp = get_client().get(status_url(ep), timeout=5, retries=0)
+            if resp.status_code != 200:
+                return
+            parsed = parse_status(resp.text)
+        except Exception:
+            # Not every mirror exposes /api/status; treat as unknown
+            return
+        with self._lock:
+            st.slots_free = parsed["slots_free"]
+            st.slot_wait = parsed["wait"]
+
+    def _score(self, st: EndpointStats, now: float) -> float:
+        # Lower is better. Untried endpoints score 0 so each one gets a first chance.
+        latency = st.latency_ewma or 0.0
+        error_rate = st.errors / st.requests if st.requests else 0.0
+        score = latency * (1.0 + 4.0 * error_rate)
+        score += max(0.0, st.retry_after - now)
+        if st.slots_free == 0:
+            score += st.slot_wait or 30.0
+        return score
+
+    def ranked(self, endpoints: List[str]) -> List[str]:
+        """Return endpoints best-first, leaving out those with an open circuit.
+
+        If every circuit is open, the one that reopens soonest is returned (half-open trial).
+        """
+        now = time.time()
+        for ep in endpoints:
+            st = self._get(ep)
+            if st.open_until <= now:
+                self._refresh_status(ep, st, now)
+        with self._lock:
+            closed = [ep for ep in endpoints if self._get(ep).open_until <= now]
+            if not closed:
+                return sorted(endpoints, key=lambda ep: self._get(ep).open_until)[:1]
+            return sorted(closed, key=lambda ep: self._score(self._get(ep), now))
+
+    def record_success(self, ep: str, latency: float) -> None:
+        with self._lock:
+            st = self._get(ep)
+            st.requests += 1
+            st.consecutive_failures = 0
+            st.open_until = 0.0
+            st.cooldown = 0.0
+            st.recent.append(latency)
+            st.latency_ewma = latency if st.latency_ewma is None else (
+                self.alpha * latency + (1 - self.alpha) * st.latency_ewma
+            )
+
+    def record_failure(self, ep: str, latency: float, status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            st = self._get(ep)
+            now = time.time()
+            st.requests += 1
+            st.errors += 1
+            st.consecutive_failures += 1
+            if status == 429:
+                st.rate_limited += 1
+            elif status == 504:
+                st.gateway_timeouts += 1
+            if retry_after:
+                st.retry_after = now + retry_after
+            # Failures still tell us how slow the endpoint is (timeouts especially)
+            st.latency_ewma = latency if st.latency_ewma is None else (
+                self.alpha * latency + (1 - self.alpha) * st.latency_ewma
+            )
+            if st.consecutive_failures >= self.failure_threshold:
+                st.cooldown = min(self.max_cooldown, st.cooldown * 2 if st.cooldown else self.base_cooldown)
+                st.open_until = now + st.cooldown
+
+    def hedge_delay(self, ep: str) -> Optional[float]:
+        """Seconds to wait on ep before hedging to another endpoint, or None if hedging is off.
+
+        Uses the configured quantile of ep's recent latencies, falling back to all endpoints'
+        history and then to a default while there is no data yet.
+        """
+        if not self.hedge_quantile:
+            return None
+        with self._lock:
+            samples = sorted(self._get(ep).recent)
+            if not samples:
+                samples = sorted(x for st in self._stats.values() for x in st.recent)
+        if not samples:
+            return self.hedge_default_delay
+        idx = min(len(samples) - 1, int(self.hedge_quantile * len(samples)))
+        return max(self.hedge_min_delay, samples[idx])
+
+    def record_hedge(self, ep: str) -> None:
+        with self._lock:
+            self._get(ep).hedged += 1
+
+    def backoff(self, ep: str, attempt: int) -> float:
+        """Seconds to wait before the next try after a failure on ep."""
+        with self._lock:
+            st = self._get(ep)
+            hint = max(0.0, st.retry_after - time.time())
+        return min(60.0, max(2.0 * (attempt + 1), hint))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return {
+                ep: {
+                    "requests": st.requests,
+                    "errors": st.errors,
+                    "rate_limited": st.rate_limited,
+                    "gateway_timeouts": st.gateway_timeouts,
+                    "latency_ewma_s": round(st.latency_ewma, 3) if st.latency_ewma is not None else None,
+                    "circuit_open": st.open_until > now,
+                    "hedged": st.hedged,
+                    "slots_free": st.slots_free,
+                }
+                for ep, st in self._stats.items()
+            }
+
+    def report(self) -> str:
+        lines = []
+        for ep, s in self.stats().items():
+            lat = f"{s['latency_ewma_s']:.2f}s" if s["latency_ewma_s"] is not None else "-"
+            lines.append(
+                f"{ep}: requests={s['requests']} errors={s['errors']} 429={s['rate_limited']} "
+                f"504={s['gateway_timeouts']} hedged={s['hedged']} latency~{lat}{' circuit=open' if s['circuit_open'] else ''}"
+            )
+        return "\n".join(lines)
+
+
+def retry_after_seconds(resp: Optional[requests.Response]) -> Optional[float]:
+    if resp is None:
+        return None
+    val = resp.headers.get("Retry-After")
+    if not val:
+        return None
+    try:
+        return float(val)
+    except ValueError:
+        return None
@@ -0,0 +1,273 @@
+"""Read matching elements from a local OSM extract (.osm.pbf or OSM XML) instead of Overpass.
+
+PBF files need pyosmium (`pip install osmium`); plain/gzip/bz2 OSM XML is read with the
+standard library.
+"""
+import bz2
+import gzip
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import osmium  # type: ignore
+except Exception:
+    osmium = None  # type: ignore
+
+TagClassifier = Callable[[Dict[str, str]], List[str]]
+BBox = List[float]  # [min_lat, min_lon, max_lat, max_lon]
+
+
+def _open_xml(path: str) -> IO[bytes]:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _iter_xml(path: str, kind: str) -> Iterator[Dict[str, Any]]:
+    # Stream one element kind ("node", "way", "relation"), clearing parsed elements as we go
+    with _open_xml(path) as f:
+        root = None
+        for event, el in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = el
+            if event != "end":
+                continue
+            tag = el.tag
+            if tag not in ("node", "way", "relation"):
+                continue
+            if tag == kind:
+                out: Dict[str, Any] = {
+                    "id": int(el.get("id", "0")),
+                    "tags": {t.get("k"): t.get("v") for t in el.findall("tag")},
+                }
+                if kind == "node":
+                    out["lat"] = float(el.get("lat", "nan"))
+                    out["lon"] = float(el.get("lon", "nan"))
+                elif kind == "way":
+                    out["refs"] = [int(nd.get("ref", "0")) for nd in el.findall("nd")]
+                else:
+                    out["members"] = [(m.get("type"), int(m.get("ref", "0"))) for m in el.findall("member")]
+                yield out
+            # Drop the parsed element and its reference from the root to keep memory flat
+            el.clear()
+            root.clear()
+
+
+def _extend(bbox: Optional[BBox], lat: float, lon: float) -> BBox:
+    if bbox is None:
+        return [lat, lon, lat, lon]
+    bbox[0] = min(bbox[0], lat)
+    bbox[1] = min(bbox[1], lon)
+    bbox[2] = max(bbox[2], lat)
+    bbox[3] = max(bbox[3], lon)
+    return bbox
+
+
+def _merge_bbox(a: Optional[BBox], b: Optional[BBox]) -> Optional[BBox]:
+    if b is None:
+        return a
+    a = _extend(a, b[0], b[1])
+    return _extend(a, b[2], b[3])
+
+
+def _center(bbox: Optional[BBox]) -> Optional[Dict[str, float]]:
+    if bbox is None:
+        return None
+    return {"lat": round((bbox[0] + bbox[2]) / 2, 7), "lon": round((bbox[1] + bbox[3]) / 2, 7)}
+
+
+def iter_extract_elements(
+    path: str,
+    classify: TagClassifier,
+    keys: Optional[Iterable[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield Overpass-shaped elements (`out tags center`) from the extract whose tags match a category.
+
+    `keys` (see tag_match.required_keys()), if given, are tag keys of which every match has
+    at least one; PBF reading uses them to drop other objects inside libosmium.
+    Way/relation coordinates are the center of the members' bounding box, as Overpass
+    computes for `out center`. The extract's own extent defines the scope (no area clipping).
+    """
+    if path.endswith(".pbf"):
+        yield from _iter_pbf_elements(path, classify, keys)
+    else:
+        yield from _iter_xml_elements(path, classify)
+
+
+def _tags(obj: Any) -> Dict[str, str]:
+    return {t.k: t.v for t in obj.tags} if len(obj.tags) else {}
+
+
+def _location(index: Any, ref: int) -> Any:
+    try:
+        loc = index.get(ref)
+    except KeyError:
+        return None
+    return loc if loc.valid() else None
+
+
+def _way_bbox(way: Any, index: Any = None) -> Optional[BBox]:
+    # Node locations as filled in by the location handler, or looked up in `index`
+    bbox: Optional[BBox] = None
+    for n in way.nodes:
+        loc = _location(index, n.ref) if index is not None else n.location
+        if loc is not None and loc.valid():
+            bbox = _extend(bbox, loc.lat, loc.lon)
+    return bbox
+
+
+def _iter_pbf_elements(path: str, classify: TagClassifier, keys: Optional[Iterable[str]]) -> Iterator[Dict[str, Any]]:
+    # Relations first (noting member ways/nodes), then nodes and ways in one pass with
+    # pyosmium's location handler, which fills way node lists from a disk-backed node
+    # index, then member ways of matched relations that didn't match themselves. Only
+    # objects with one of `keys` (or a wanted id) are turned into Python objects.
+    if osmium is None:
+        raise RuntimeError("Reading .osm.pbf requires pyosmium (pip install osmium)")
+    keys = list(keys) if keys is not None else None
+
+    def processor(entities: Any, *filters: Any) -> Any:
+        fp = osmium.FileProcessor(path, entities)
+        for f in filters:
+            fp = fp.with_filter(f)
+        return fp
+
+    key_filters = [osmium.filter.KeyFilter(*keys)] if keys else []
+    member_kinds = {"n": "node", "w": "way", "r": "relation"}
+    relations: Dict[int, Dict[str, Any]] = {}
+    rel_ways: Dict[int, List[int]] = {}
+    rel_nodes: Dict[int, List[int]] = {}
+    for rel in processor(osmium.osm.RELATION, *key_filters):
+        tags = _tags(rel)
+        if not tags or not classify(tags):
+            continue
+        relations[rel.id] = {"type": "relation", "id": rel.id, "tags": tags}
+        for m in rel.members:
+            if member_kinds.get(m.type) == "way":
+                rel_ways.setdefault(m.ref, []).append(rel.id)
+            elif member_kinds.get(m.type) == "node":
+                rel_nodes.setdefault(m.ref, []).append(rel.id)
+
+    way_bbox: Dict[int, BBox] = {}
+    with tempfile.TemporaryDirectory(prefix="osm_extract_") as tmp:
+        index = osmium.index.create_map("sparse_file_array," + os.path.join(tmp, "nodes.idx"))
+        fp = processor(osmium.osm.NODE | osmium.osm.WAY, *key_filters).with_locations(index)
+        for obj in fp:
+            tags = _tags(obj)
+            if obj.is_node():
+                if obj.location.valid() and tags and classify(tags):
+                    yield {
+                        "type": "node", "id": obj.id,
+                        "lat": round(obj.location.lat, 7), "lon": round(obj.location.lon, 7),
+                        "tags": tags,
+                    }
+                continue
+            bbox = _way_bbox(obj)
+            if obj.id in rel_ways and bbox is not None:
+                way_bbox[obj.id] = bbox
+            if tags and classify(tags):
+                el: Dict[str, Any] = {"type": "way", "id": obj.id, "tags": tags}
+                center = _center(bbox)
+                if center:
+                    el["center"] = center
+                yield el
+
+        missing = set(rel_ways) - set(way_bbox)
+        if missing:
+            # Member ways without any of the keys; node locations come from the index
+            for way in processor(osmium.osm.WAY, osmium.filter.IdFilter(missing)):
+                bbox = _way_bbox(way, index)
+                if bbox is not None:
+                    way_bbox[way.id] = bbox
+
+        rel_bbox: Dict[int, Optional[BBox]] = {}
+        for wid, rids in rel_ways.items():
+            for rid in rids:
+                rel_bbox[rid] = _merge_bbox(rel_bbox.get(rid), way_bbox.get(wid))
+        for nid, rids in rel_nodes.items():
+            loc = _location(index, nid)
+            if loc is not None:
+                for rid in rids:
+                    rel_bbox[rid] = _extend(rel_bbox.get(rid), loc.lat, loc.lon)
+    for rid, el in relations.items():
+        center = _center(rel_bbox.get(rid))
+        if center:
+            el["center"] = center
+        yield el
+
+
+def _iter_xml_elements(path: str, classify: TagClassifier) -> Iterator[Dict[str, Any]]:
+    # The file is streamed three times, in the reverse of the order dependencies are needed:
+    # relations (keep matches, note member ways/nodes), ways (keep matches and member ways,
+    # note their node refs), then nodes (emit matches, record coordinates of noted refs
+    # only). Memory thus scales with the number of matches rather than the extract size.
+
+    # Pass 1: relations
+    relations: Dict[int, Dict[str, Any]] = {}
+    rel_ways: Dict[int, List[int]] = {}
+    rel_nodes: Dict[int, List[int]] = {}
+    for rel in _iter_xml(path, "relation"):
+        if not rel["tags"] or not classify(rel["tags"]):
+            continue
+        relations[rel["id"]] = {"type": "relation", "id": rel["id"], "tags": rel["tags"]}
+        for mtype, ref in rel["members"]:
+            if mtype == "way":
+                rel_ways.setdefault(ref, []).append(rel["id"])
+            elif mtype == "node":
+                rel_nodes.setdefault(ref, []).append(rel["id"])
+
+    # Pass 2: ways
+    ways: Dict[int, Dict[str, Any]] = {}
+    way_refs: Dict[int, List[int]] = {}
+    needed: Set[int] = set(rel_nodes)
+    for way in _iter_xml(path, "way"):
+        matched = bool(way["tags"]) and bool(classify(way["tags"]))
+        if not matched and way["id"] not in rel_ways:
+            continue
+        if matched:
+            ways[way["id"]] = {"type": "way", "id": way["id"], "tags": way["tags"]}
+        way_refs[way["id"]] = way["refs"]
+        needed.update(way["refs"])
+
+    # Pass 3: nodes; matching ones are emitted right away
+    coords: Dict[int, Tuple[float, float]] = {}
+    for node in _iter_xml(path, "node"):
+        if node["id"] in needed:
+            coords[node["id"]] = (node["lat"], node["lon"])
+        if node["tags"] and classify(node["tags"]):
+            yield {
+                "type": "node", "id": node["id"],
+                "lat": round(node["lat"], 7), "lon": round(node["lon"], 7),
+                "tags": node["tags"],
+            }
+
+    way_bbox: Dict[int, BBox] = {}
+    for wid, refs in way_refs.items():
+        bbox: Optional[BBox] = None
+        for ref in refs:
+            if ref in coords:
+                bbox = _extend(bbox, *coords[ref])
+        if bbox is not None:
+            way_bbox[wid] = bbox
+    for wid, el in ways.items():
+        center = _center(way_bbox.get(wid))
+        if center:
+            el["center"] = center
+        yield el
+
+    rel_bbox: Dict[int, Optional[BBox]] = {}
+    for wid, rids in rel_ways.items():
+        for rid in rids:
+            rel_bbox[rid] = _merge_bbox(rel_bbox.get(rid), way_bbox.get(wid))
+    for nid, rids in rel_nodes.items():
+        if nid in coords:
+            for rid in rids:
+                rel_bbox[rid] = _extend(rel_bbox.get(rid), *coords[nid])
+    for rid, el in relations.items():
+        center = _center(rel_bbox.get(rid))
+        if center:
+            el["center"] = center
+        yield el
@@ -0,0 +1,100 @@
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+
+class CacheMiss(Exception):
+    """Raised in cache-only mode when no cached response exists for a query."""
+
+
+def normalize_ql(ql: str) -> str:
+    # Collapse whitespace so formatting-only changes map to the same entry
+    return re.sub(r"\s+", " ", ql).strip()
+
+
+def cache_key(endpoint: str, ql: str) -> str:
+    h = hashlib.sha256()
+    h.update(endpoint.strip().encode("utf-8"))
+    h.update(b"\n")
+    h.update(normalize_ql(ql).encode("utf-8"))
+    return h.hexdigest()
+
+
+class OverpassCache:
+    """Content-addressed, gzip-compressed store of Overpass responses.
+
+    Entries are keyed by (endpoint, normalized QL) and expire after `ttl` seconds.
+    With `offline=True` the network is never used: any cached entry is replayed
+    regardless of age, and a missing entry raises CacheMiss.
+    """
+
+    def __init__(self, root: str, ttl: float = 86400, offline: bool = False):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.offline = offline
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json.gz"
+
+    def _fresh(self, endpoints: List[str], ql: str) -> Iterator[Path]:
+        now = time.time()
+        for ep in endpoints:
+            path = self._path(cache_key(ep, ql))
+            try:
+                age = now - path.stat().st_mtime
+            except OSError:
+                continue
+            if not self.offline and age > self.ttl:
+                continue
+            yield path
+
+    def _miss(self, endpoints: List[str], ql: str) -> None:
+        if self.offline:
+            raise CacheMiss(f"No cached Overpass response for query {cache_key(endpoints[0] if endpoints else '', ql)[:12]}")
+
+    def get(self, endpoints: List[str], ql: str) -> Optional[Dict[str, Any]]:
+        for path in self._fresh(endpoints, ql):
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception:
+                # Corrupt/partial entry; ignore and refetch
+                continue
+        self._miss(endpoints, ql)
+        return None
+
+    def open(self, endpoints: List[str], ql: str) -> Optional[IO[bytes]]:
+        """Return the decompressed cached response as a binary stream, or None on a miss."""
+        for path in self._fresh(endpoints, ql):
+            try:
+                return gzip.open(path, "rb")
+            except OSError:
+                continue
+        self._miss(endpoints, ql)
+        return None
+
+    def put(self, endpoint: str, ql: str, data: Dict[str, Any]) -> None:
+        with self.writer(endpoint, ql) as f:
+            f.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    @contextlib.contextmanager
+    def writer(self, endpoint: str, ql: str) -> Iterator[IO[bytes]]:
+        """Stream raw response bytes into the cache; the entry is only committed on a clean exit."""
+        path = self._path(cache_key(endpoint, ql))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so concurrent readers never see partial entries
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with gzip.open(tmp, "wb") as f:
+                yield f
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
@@ -0,0 +1,69 @@
+import json
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+def _element_from_xml(node: ET.Element) -> Dict[str, Any]:
+    # Mirror the shape of Overpass JSON elements so to_feature() can consume them
+    el: Dict[str, Any] = {"type": node.tag, "id": int(node.get("id", "0"))}
+    if node.get("lat") is not None and node.get("lon") is not None:
+        el["lat"] = float(node.get("lat"))  # type: ignore[arg-type]
+        el["lon"] = float(node.get("lon"))  # type: ignore[arg-type]
+    center = node.find("center")
+    if center is not None:
+        el["center"] = {"lat": float(center.get("lat")), "lon": float(center.get("lon"))}  # type: ignore[arg-type]
+    tags = {t.get("k"): t.get("v") for t in node.findall("tag")}
+    if tags:
+        el["tags"] = tags
+    return el
+
+
+def _first_element(parent: Optional[ET.Element]) -> Optional[ET.Element]:
+    if parent is None:
+        return None
+    for child in parent:
+        if child.tag in ("node", "way", "relation"):
+            return child
+    return None
+
+
+def parse_adiff(xml_bytes: bytes) -> Dict[str, Any]:
+    """Parse an Overpass augmented diff (XML) into a JSON-serializable dict.
+
+    Returns {"osm3s": {"timestamp_osm_base": ...}, "actions": [{"action": ..., "element": ...}]}
+    where action is "create", "modify" or "delete" and element is the new state
+    (the old state for deletions).
+    """
+    root = ET.fromstring(xml_bytes)
+    out: Dict[str, Any] = {"osm3s": {}, "actions": []}
+    meta = root.find("meta")
+    if meta is not None and meta.get("osm_base"):
+        out["osm3s"]["timestamp_osm_base"] = meta.get("osm_base")
+    for action in root.findall("action"):
+        kind = action.get("type")
+        if kind == "create":
+            node = _first_element(action)
+        elif kind == "modify":
+            node = _first_element(action.find("new"))
+        elif kind == "delete":
+            node = _first_element(action.find("old"))
+        else:
+            continue
+        if node is None:
+            continue
+        out["actions"].append({"action": kind, "element": _element_from_xml(node)})
+    return out
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def save_state(path: str, state: Dict[str, Any]) -> None:
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -1,13 +1,32 @@
 import argparse
+import contextlib
+import contextvars
 import json
 import sys
 import time
-import random
-from typing import Dict, List, Tuple, Any
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterator, List, Tuple, Any, Optional
 from urllib.parse import urlparse
 
 import requests
 
+# Shared HTTP client (pooled connections, per-host counters) lives in the ETL package
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from etl.util.http import AbortableSession, get_client  # noqa: E402
+from etl.util.flatgeobuf import write_flatgeobuf  # noqa: E402
+from etl.util.urls import canonical_url  # noqa: E402
+
+from overpass_cache import OverpassCache
+from overpass_diff import parse_adiff, load_state, save_state
+from overpass_stream import iter_csv_elements, iter_elements
+from tag_match import compile_categories, expr_keys, required_keys
+from place_record import PlaceRecord, project_tags
+from osm_extract import iter_extract_elements
+from endpoints import EndpointScheduler, retry_after_seconds
+
 
 DEFAULT_ENDPOINT = "https://overpass-api.de/api/interpreter"
 DEFAULT_ENDPOINTS = [
@@ -15,6 +34,13 @@ DEFAULT_ENDPOINTS = [
     "https://overpass-api.de/api/interpreter",
 ]
 
+# Bytes read per chunk when streaming Overpass responses
+STREAM_CHUNK = 64 * 1024
+# (connect, read) timeouts of an Overpass query, and of a hedged backup request sent while
+# the primary is still running: the backup only helps if it is quick
+QUERY_TIMEOUT = (10, 180)
+HEDGE_TIMEOUT = (10, 60)
+
 
 # Category definitions with Overpass tag selectors.
 # Each entry is a list of tag expressions to match; we will query node/way/relation for each.
@@ -35,43 +61,394 @@ CATEGORY_DEFS: Dict[str, List[str]] = {
 }
 
 
+# Whole-country scope used by the default (untiled) mode: (label, area statement, filter).
+NATIONAL_TILE: Tuple[str, str, str] = ("SE", 'area["ISO3166-1"="SE"][admin_level=2]->.a;', "(area.a)")
+
+# Swedish counties (län) by ISO 3166-2 code, used by the "counties" tiling.
+SE_COUNTIES = [
+    "SE-AB", "SE-AC", "SE-BD", "SE-C", "SE-D", "SE-E", "SE-F", "SE-G", "SE-H", "SE-I", "SE-K",
+    "SE-M", "SE-N", "SE-O", "SE-S", "SE-T", "SE-U", "SE-W", "SE-X", "SE-Y", "SE-Z",
+]
+
+# Approximate bounding box of Sweden (south, west, north, east), used by "RxC" grid tiling.
+SE_BBOX = (55.0, 10.5, 69.1, 24.2)
+
+
+def build_scoped_query(scope: str, tag_expr: str) -> str:
+    """Return an Overpass QL snippet that fetches node/way/relation with tag_expr within scope.
+
+    scope is one or more Overpass filters, e.g. '(area.a)' or '(area.a)(55.0,10.5,62.0,24.2)'.
+    """
+    return (
+        f"node{tag_expr}{scope};\n"
+        f"way{tag_expr}{scope};\n"
+        f"relation{tag_expr}{scope};\n"
+    )
+
+
 def build_category_query(area_alias: str, tag_expr: str) -> str:
     """Return an Overpass QL snippet that fetches node/way/relation with tag_expr in the given area.
 
     Example tag_expr: '["tourism"="camp_site"]'
     """
-    return (
-        f"node{tag_expr}(area.{area_alias});\n"
-        f"way{tag_expr}(area.{area_alias});\n"
-        f"relation{tag_expr}(area.{area_alias});\n"
+    return build_scoped_query(f"(area.{area_alias})", tag_expr)
+
+
+def build_tiles(spec: str) -> List[Tuple[str, str, str]]:
+    """Split Sweden into tiles of (label, area statement, filter).
+
+    spec is either "counties" (one tile per län) or "RxC" for a bbox grid of R rows and C columns.
+    Grid tiles stay clipped to the national area, so elements outside Sweden are not fetched.
+    """
+    spec = (spec or "").strip().lower()
+    if not spec:
+        return [NATIONAL_TILE]
+    if spec == "counties":
+        return [
+            (code, f'area["ISO3166-2"="{code}"]->.a;', "(area.a)")
+            for code in SE_COUNTIES
+        ]
+    try:
+        rows, cols = [int(x) for x in spec.split("x")]
+    except ValueError:
+        raise ValueError(f"Invalid tile spec: {spec!r} (use 'counties' or e.g. '4x3')")
+    if rows < 1 or cols < 1:
+        raise ValueError(f"Invalid tile spec: {spec!r}")
+    south, west, north, east = SE_BBOX
+    dlat = (north - south) / rows
+    dlon = (east - west) / cols
+    tiles: List[Tuple[str, str, str]] = []
+    for r in range(rows):
+        for c in range(cols):
+            s, w = south + r * dlat, west + c * dlon
+            bbox = f"{s:.4f},{w:.4f},{s + dlat:.4f},{w + dlon:.4f}"
+            tiles.append((f"{r}x{c}", NATIONAL_TILE[1], f"(area.a)({bbox})"))
+    return tiles
+
+
+OVERPASS_HEADERS = {
+    "User-Agent": "LawnmoverScraper/0.1 (+https://github.com/perwinroth/lawnmover)",
+    "Accept-Language": "sv,en;q=0.8",
+}
+
+
+def _record_failure(scheduler: EndpointScheduler, ep: str, started: float, err: Exception) -> None:
+    resp = getattr(err, "response", None)
+    scheduler.record_failure(
+        ep, time.monotonic() - started,
+        status=resp.status_code if resp is not None else None,
+        retry_after=retry_after_seconds(resp),
     )
 
 
-def run_overpass(endpoints: List[str], ql: str, retries: int = 3) -> Dict[str, Any]:
-    headers = {
-        "User-Agent": "LawnmoverScraper/0.1 (+https://github.com/perwinroth/lawnmover)",
-        "Accept-Language": "sv,en;q=0.8",
-    }
-    eps = list(endpoints)
+def run_overpass(
+    endpoints: List[str],
+    ql: str,
+    retries: int = 3,
+    slots: Optional[Dict[str, threading.Semaphore]] = None,
+    cache: Optional[OverpassCache] = None,
+    decode: Optional[Callable[[requests.Response], Dict[str, Any]]] = None,
+    scheduler: Optional[EndpointScheduler] = None,
+) -> Dict[str, Any]:
+    if cache is not None:
+        cached = cache.get(endpoints, ql)
+        if cached is not None:
+            return cached
+    scheduler = scheduler or EndpointScheduler(endpoints)
     last_err: Exception | None = None
     for attempt in range(retries):
-        random.shuffle(eps)
-        for ep in eps:
+        for ep in scheduler.ranked(endpoints):
+            started = time.monotonic()
             try:
-                resp = requests.post(ep, data={"data": ql}, headers=headers, timeout=180)
+                # Optional per-endpoint concurrency cap (used by the tiled mode)
+                slot = slots.get(ep) if slots else None
+                if slot is not None:
+                    with slot:
+                        resp = get_client().post(ep, data={"data": ql}, headers=OVERPASS_HEADERS, timeout=180, retries=0)
+                else:
+                    resp = get_client().post(ep, data={"data": ql}, headers=OVERPASS_HEADERS, timeout=180, retries=0)
                 resp.raise_for_status()
-                return resp.json()
+                data = decode(resp) if decode else resp.json()
             except Exception as e:
                 last_err = e
-                time.sleep(2 * (attempt + 1))
+                _record_failure(scheduler, ep, started, e)
                 continue
+            scheduler.record_success(ep, time.monotonic() - started)
+            if cache is not None:
+                try:
+                    cache.put(ep, ql, data)
+                except OSError:
+                    pass
+            return data
+        if attempt + 1 < retries:
+            # Every candidate failed this round; wait for the soonest one to be worth retrying
+            time.sleep(min(scheduler.backoff(ep, attempt) for ep in endpoints))
     if last_err:
         raise last_err
     return {"elements": []}
 
 
+def _tee(chunks: Iterator[bytes], sink: IO[bytes]) -> Iterator[bytes]:
+    for chunk in chunks:
+        sink.write(chunk)
+        yield chunk
+
+
+class _Leg:
+    """Endpoint slot and connection of one hedged request, given up as soon as it loses.
+
+    A hedged request runs on its own AbortableSession: abandon() releases the slot and
+    aborts the request even while it waits for headers, and a leg abandoned before it got
+    its slot never sends its request. Releasing is idempotent.
+    """
+
+    def __init__(self, slot: Optional[threading.Semaphore], session: Optional[AbortableSession] = None):
+        self.slot = slot
+        self.session = session
+        self._lock = threading.Lock()
+        self._held = False
+        self.abandoned = False
+
+    def acquire(self) -> bool:
+        if self.slot is not None:
+            self.slot.acquire()
+        with self._lock:
+            self._held = not self.abandoned
+            held = self._held
+        if not held and self.slot is not None:
+            self.slot.release()
+        return held
+
+    def release(self) -> None:
+        with self._lock:
+            held, self._held = self._held, False
+        if held and self.slot is not None:
+            self.slot.release()
+
+    def abandon(self) -> None:
+        with self._lock:
+            self.abandoned = True
+        self.release()
+        if self.session is not None:
+            self.session.abort()
+
+
+def _post_stream(
+    ep: str,
+    ql: str,
+    scheduler: EndpointScheduler,
+    slots: Optional[Dict[str, threading.Semaphore]] = None,
+    timeout: Any = QUERY_TIMEOUT,
+    leg: Optional[_Leg] = None,
+) -> Tuple[str, requests.Response, Optional[threading.Semaphore], float]:
+    # Send the query and wait for the response headers. On success the caller owns the
+    # response and the endpoint's concurrency slot (if any) and must release both; for a
+    # hedged request (`leg`) the slot is released through the leg.
+    leg = leg or _Leg(slots.get(ep) if slots else None)
+    if not leg.acquire():
+        raise RuntimeError(f"Hedged request to {ep} no longer needed")
+    started = time.monotonic()
+    resp = None
+    try:
+        resp = get_client().post(
+            ep, data={"data": ql}, headers=OVERPASS_HEADERS, timeout=timeout, retries=0, stream=True, session=leg.session,
+        )
+        resp.raise_for_status()
+    except Exception as e:
+        # An aborted hedge says nothing about the endpoint
+        if not leg.abandoned:
+            _record_failure(scheduler, ep, started, e)
+        if resp is not None:
+            resp.close()
+        leg.release()
+        if leg.session is not None:
+            leg.session.close()
+        raise
+    if leg.session is not None:
+        # The leg's session goes with its response
+        close, session = resp.close, leg.session
+
+        def close_all() -> None:
+            close()
+            session.close()
+
+        resp.close = close_all  # type: ignore[method-assign]
+    return ep, resp, leg.slot, started
+
+
+def _discard(fut: "Future[Tuple[str, requests.Response, Optional[threading.Semaphore], float]]") -> None:
+    # Close a losing hedged request's response once it returns (its slot is already back)
+    if fut.cancelled() or fut.exception() is not None:
+        return
+    _, resp, _, _ = fut.result()
+    resp.close()
+
+
+def _start_leg(ep: str, ql: str, scheduler: EndpointScheduler, timeout: Any, leg: _Leg) -> "Future[Any]":
+    # One hedged request on a daemon thread, so an abandoned leg can never keep the
+    # process from exiting. Runs in a copy of the caller's context so per-stage HTTP
+    # counters still apply.
+    fut: "Future[Any]" = Future()
+    ctx = contextvars.copy_context()
+
+    def run() -> None:
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(ctx.run(_post_stream, ep, ql, scheduler, None, timeout, leg))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=run, name=f"overpass-hedge {ep}", daemon=True).start()
+    return fut
+
+
+def _open_stream(
+    cands: List[str],
+    ql: str,
+    scheduler: EndpointScheduler,
+    slots: Optional[Dict[str, threading.Semaphore]] = None,
+) -> Tuple[str, requests.Response, Optional[threading.Semaphore], float]:
+    """Open a streaming response from the best candidate, consuming candidates from the list.
+
+    With hedging enabled, a backup request goes to the next candidate if the primary hasn't
+    started responding within scheduler.hedge_delay(); that backup gets HEDGE_TIMEOUT. If
+    the primary failed early instead, the next candidate gets the full query timeout. The
+    first response wins and the other request is aborted and gives up its endpoint slot.
+    """
+    primary = cands.pop(0)
+    delay = scheduler.hedge_delay(primary) if cands else None
+    if delay is None:
+        return _post_stream(primary, ql, scheduler, slots)
+
+    legs: Dict["Future[Any]", _Leg] = {}
+
+    def submit(ep: str, timeout: Any) -> "Future[Any]":
+        leg = _Leg(slots.get(ep) if slots else None, get_client().abortable_session())
+        fut = _start_leg(ep, ql, scheduler, timeout, leg)
+        legs[fut] = leg
+        return fut
+
+    first = submit(primary, QUERY_TIMEOUT)
+    done, _ = wait([first], timeout=delay)
+    if not done:
+        scheduler.record_hedge(primary)
+        submit(cands.pop(0), HEDGE_TIMEOUT)
+    elif first.exception() is not None:
+        # Plain failover: the primary is out of the race
+        submit(cands.pop(0), QUERY_TIMEOUT)
+    pending = set(legs)
+    winner = None
+    last_err: Exception | None = None
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            err = fut.exception()
+            if err is not None:
+                last_err = err  # type: ignore[assignment]
+            elif winner is None:
+                winner = fut.result()
+            else:
+                legs[fut].abandon()
+                _discard(fut)
+    for fut in pending:
+        legs[fut].abandon()
+        fut.add_done_callback(_discard)
+    if winner is None:
+        raise last_err or RuntimeError("No Overpass endpoint responded")
+    return winner
+
+
+def _parse_stream(ql: str, chunks: Iterator[bytes], meta: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # CSV responses (see csv_settings()) have no osm3s header, so meta gets no timestamp
+    if ql.lstrip().startswith("[out:csv"):
+        return iter_csv_elements(chunks)
+    return iter_elements(chunks, meta)
+
+
+def stream_overpass(
+    endpoints: List[str],
+    ql: str,
+    retries: int = 3,
+    slots: Optional[Dict[str, threading.Semaphore]] = None,
+    cache: Optional[OverpassCache] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    scheduler: Optional[EndpointScheduler] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Like run_overpass(), but yield elements one at a time while the response streams in.
+
+    A failure mid-stream restarts the query on another endpoint, so elements already
+    yielded may be yielded again; consumers must merge by (type, id).
+    """
+    if cache is not None:
+        f = cache.open(endpoints, ql)
+        if f is not None:
+            with f:
+                yield from _parse_stream(ql, iter(lambda: f.read(STREAM_CHUNK), b""), meta)
+            return
+    scheduler = scheduler or EndpointScheduler(endpoints)
+    last_err: Exception | None = None
+    for attempt in range(retries):
+        cands = scheduler.ranked(endpoints)
+        while cands:
+            try:
+                # Failures while connecting are recorded per endpoint by _post_stream
+                ep, resp, slot, started = _open_stream(cands, ql, scheduler, slots)
+            except Exception as e:
+                last_err = e
+                continue
+            # Latency is time until the server starts responding
+            latency = time.monotonic() - started
+            try:
+                with contextlib.ExitStack() as stack:
+                    # The endpoint's concurrency slot is held until the stream is consumed
+                    if slot is not None:
+                        stack.callback(slot.release)
+                    stack.callback(resp.close)
+                    chunks = resp.iter_content(STREAM_CHUNK)
+                    if cache is not None:
+                        # Cache the raw body as it streams; only committed once fully read
+                        chunks = _tee(chunks, stack.enter_context(cache.writer(ep, ql)))
+                    yield from _parse_stream(ql, chunks, meta)
+                    for _ in chunks:
+                        # Drain the trailer so the cached copy is complete
+                        pass
+            except Exception as e:
+                last_err = e
+                _record_failure(scheduler, ep, started, e)
+                continue
+            scheduler.record_success(ep, latency)
+            return
+        if attempt + 1 < retries:
+            # Every candidate failed this round; wait for the soonest one to be worth retrying
+            time.sleep(min(scheduler.backoff(ep, attempt) for ep in endpoints))
+    if last_err:
+        raise last_err
+
+
+# Tags to_record() reads to build a feature
+NAME_KEYS = ("name:sv", "name", "name:en", "ref")
+WEBSITE_KEYS = ("website", "contact:website", "url")
+SOCIAL_KEYS = ("facebook", "contact:facebook", "instagram", "contact:instagram", "twitter", "contact:twitter")
+ADDR_KEYS = ("addr:street", "addr:housenumber", "addr:postcode", "addr:city", "addr:town", "addr:village")
+FEATURE_INPUT_KEYS = NAME_KEYS + ("brand",) + WEBSITE_KEYS + SOCIAL_KEYS + ADDR_KEYS
+
+# Tags copied into each feature's "tags" property unless a different projection is asked for
+DEFAULT_TAG_KEYS = ("opening_hours", "brand", "shop", "phone", "contact:phone")
+
+
+def parse_tag_keys(spec: str) -> Optional[Tuple[str, ...]]:
+    """Parse a --tags value: "" for DEFAULT_TAG_KEYS, "all" to keep every tag (None), else a comma list."""
+    spec = spec.strip()
+    if not spec:
+        return DEFAULT_TAG_KEYS
+    if spec == "all":
+        return None
+    return tuple(k.strip() for k in spec.split(",") if k.strip())
+
+
 def choose_name(tags: Dict[str, str]) -> str:
-    for k in ("name:sv", "name", "name:en", "ref"):
+    for k in NAME_KEYS:
         v = tags.get(k)
         if v:
             return v
@@ -79,26 +456,26 @@ def choose_name(tags: Dict[str, str]) -> str:
 
 
 def choose_website(tags: Dict[str, str], include_social: bool = True) -> str:
-    for k in ("website", "contact:website", "url"):
-        v = tags.get(k)
+    # Canonical form (https:// added when missing, tracking parameters dropped, ...) so the
+    # same site tagged differently gives the same URL
+    for k in WEBSITE_KEYS:
+        v = (tags.get(k) or "").strip()
         if v:
-            if v.startswith("http://") or v.startswith("https://"):
-                return v
-            return "https://" + v
+            return canonical_url(v)
     if include_social:
-        for k in ("facebook", "contact:facebook", "instagram", "contact:instagram", "twitter", "contact:twitter"):
-            v = tags.get(k)
+        for k in SOCIAL_KEYS:
+            v = (tags.get(k) or "").strip()
             if not v:
                 continue
             if v.startswith("http://") or v.startswith("https://"):
-                return v
+                return canonical_url(v)
             h = v.strip("/")
             if "facebook" in k:
-                return f"https://facebook.com/{h}"
+                return canonical_url(f"https://facebook.com/{h}")
             if "instagram" in k:
-                return f"https://instagram.com/{h}"
+                return canonical_url(f"https://instagram.com/{h}")
             if "twitter" in k:
-                return f"https://twitter.com/{h}"
+                return canonical_url(f"https://twitter.com/{h}")
     return ""
 
 
@@ -106,7 +483,16 @@ def osm_url(el: Dict[str, Any]) -> str:
     return f"https://www.openstreetmap.org/{el['type']}/{el['id']}"
 
 
-def to_feature(el: Dict[str, Any], categories: List[str], include_social: bool = True) -> Dict[str, Any]:
+def to_record(
+    el: Dict[str, Any],
+    categories: List[str],
+    include_social: bool = True,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+) -> PlaceRecord:
+    """Convert an Overpass element to a PlaceRecord, keeping only `tag_keys` of its tags (None keeps all).
+
+    Raises ValueError for elements that must not become features.
+    """
     tags = el.get("tags", {})
     # Exclude obvious false positives by brand/name
     import re as _re
@@ -129,55 +515,48 @@ def to_feature(el: Dict[str, Any], categories: List[str], include_social: bool =
         raise ValueError("Missing coordinates")
 
     name = choose_name(tags)
-    fallback_link = osm_url(el)
-
-    # Address assembly from OSM addr:* tags
-    addr_street = tags.get('addr:street')
-    addr_hnr = tags.get('addr:housenumber')
-    addr_postcode = tags.get('addr:postcode')
-    addr_city = tags.get('addr:city') or tags.get('addr:town') or tags.get('addr:village')
-    addr_parts = []
-    if addr_street:
-        addr_parts.append(addr_street + (f" {addr_hnr}" if addr_hnr else ""))
-    if addr_postcode or addr_city:
-        addr_parts.append(" ".join([p for p in [addr_postcode, addr_city] if p]))
-    address = ", ".join([p for p in addr_parts if p])
-
-    props = {
-        "id": f"{el['type']}/{el['id']}",
-        "name": name if name and name != "(namnlös)" else (
+
+    return PlaceRecord(
+        el["type"], el["id"], lat, lon,
+        name if name and name != "(namnlös)" else (
             (categories[0].replace('_', ' ').title() + f" – {hostname(website)}") if categories else hostname(website) or "(namnlös)"
         ),
-        "categories": sorted(set(categories)),
-        "link": website,
-        "osm_url": fallback_link,
-        "address": address,
-        "addr": {
-            "street": addr_street,
-            "housenumber": addr_hnr,
-            "postcode": addr_postcode,
-            "city": addr_city,
-        },
-        "tags": tags,
-    }
-    return {
-        "type": "Feature",
-        "geometry": {"type": "Point", "coordinates": [lon, lat]},
-        "properties": props,
-    }
+        tuple(sorted(set(categories))),
+        website,
+        # Address from OSM addr:* tags
+        street=tags.get('addr:street'),
+        housenumber=tags.get('addr:housenumber'),
+        postcode=tags.get('addr:postcode'),
+        city=tags.get('addr:city') or tags.get('addr:town') or tags.get('addr:village'),
+        tags=project_tags(tags, tag_keys),
+    )
+
+
+def to_feature(
+    el: Dict[str, Any],
+    categories: List[str],
+    include_social: bool = True,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+) -> Dict[str, Any]:
+    return to_record(el, categories, include_social=include_social, tag_keys=tag_keys).to_geojson()
 
 
-def build_master_query(categories: List[str]) -> List[Tuple[str, str]]:
+def build_master_query(
+    categories: List[str],
+    tile: Tuple[str, str, str] = NATIONAL_TILE,
+    settings: str = "[out:json][timeout:180]",
+) -> List[Tuple[str, str]]:
     # Build a list of (category, query) pairs
+    _, area_stmt, scope = tile
     pairs: List[Tuple[str, str]] = []
     for cat in categories:
         exprs = CATEGORY_DEFS.get(cat, [])
         if not exprs:
             continue
-        combined = "".join(build_category_query("a", e) for e in exprs)
+        combined = "".join(build_scoped_query(scope, e) for e in exprs)
         ql = (
-            "[out:json][timeout:180];\n"
-            "area[\"ISO3166-1\"=\"SE\"][admin_level=2]->.a;\n"
+            f"{settings};\n"
+            f"{area_stmt}\n"
             "(\n" + combined + ")\n"
             ";\nout tags center;\n"
         )
@@ -185,39 +564,399 @@ def build_master_query(categories: List[str]) -> List[Tuple[str, str]]:
     return pairs
 
 
-def scrape(endpoint: str, categories: List[str], include_social: bool = True, retries: int = 3) -> List[Dict[str, Any]]:
-    # Accumulate elements and their categories by (type, id)
-    elements: Dict[Tuple[str, int], Dict[str, Any]] = {}
-    el_cats: Dict[Tuple[str, int], List[str]] = {}
+def _note_osm_base(meta: Optional[Dict[str, Any]], data: Dict[str, Any]) -> None:
+    # Keep the oldest data timestamp seen; the next incremental run starts from there
+    if meta is None:
+        return
+    ts = (data.get("osm3s") or {}).get("timestamp_osm_base")
+    if ts and (not meta.get("timestamp_osm_base") or ts < meta["timestamp_osm_base"]):
+        meta["timestamp_osm_base"] = ts
+
+
+FeatureMap = Dict[Tuple[str, int], Optional[PlaceRecord]]
+
+# Maps an element's tags to the categories it belongs to
+Classifier = Callable[[Dict[str, str]], List[str]]
+
+
+def build_combined_query(
+    categories: List[str],
+    tile: Tuple[str, str, str] = NATIONAL_TILE,
+    settings: str = "[out:json][timeout:180]",
+) -> str:
+    """Return one union query covering every tag expression of the given categories."""
+    _, area_stmt, scope = tile
+    exprs: List[str] = []
+    for cat in categories:
+        for e in CATEGORY_DEFS.get(cat, []):
+            if e not in exprs:
+                exprs.append(e)
+    combined = "".join(build_scoped_query(scope, e) for e in exprs)
+    return (
+        f"{settings};\n"
+        f"{area_stmt}\n"
+        "(\n" + combined + ")\n"
+        ";\nout tags center;\n"
+    )
+
+
+def query_tag_keys(categories: List[str], tag_keys: Tuple[str, ...], combined: bool = False) -> List[str]:
+    """Tags a projected (CSV) query must return: those to_record() reads, the projection itself,
+    and in combined mode the keys the category selectors test."""
+    keys: List[str] = []
+    sources: List[Any] = [FEATURE_INPUT_KEYS, tag_keys]
+    if combined:
+        sources += [expr_keys(e) for c in categories for e in CATEGORY_DEFS.get(c, [])]
+    for src in sources:
+        for k in src:
+            if k not in keys:
+                keys.append(k)
+    return keys
+
+
+def csv_settings(keys: List[str], timeout: int = 180) -> str:
+    """Query settings asking Overpass for tab-separated output with only the given tag columns."""
+    cols = ",".join(["::type", "::id", "::lat", "::lon"] + [f'"{k}"' for k in keys])
+    return f'[out:csv({cols}; true; "\\t")][timeout:{timeout}]'
 
-    endpoints = [e.strip() for e in endpoint.split(',') if e.strip()] or DEFAULT_ENDPOINTS
 
-    for cat, ql in build_master_query(categories):
-        data = run_overpass(endpoints, ql, retries=retries)
-        for el in data.get("elements", []):
+def build_jobs(
+    categories: List[str],
+    tile: Tuple[str, str, str] = NATIONAL_TILE,
+    combined: bool = False,
+    settings: str = "[out:json][timeout:180]",
+) -> List[Tuple[str, str, Classifier]]:
+    """Return (label, query, classifier) triples for one tile.
+
+    Per-category mode issues one query per category and tags every result with it. Combined
+    mode issues a single union query and assigns categories locally from the element's tags.
+    """
+    if combined:
+        cats = [c for c in categories if CATEGORY_DEFS.get(c)]
+        if not cats:
+            return []
+        return [("all", build_combined_query(cats, tile, settings), compile_categories(CATEGORY_DEFS, cats))]
+    return [(cat, ql, lambda tags, c=cat: [c]) for cat, ql in build_master_query(categories, tile, settings)]
+
+
+def job_settings(categories: List[str], tag_keys: Optional[Tuple[str, ...]], combined: bool = False, csv: bool = False) -> str:
+    if not csv:
+        return "[out:json][timeout:180]"
+    if tag_keys is None:
+        raise ValueError("CSV output needs a tag projection (it can't return all tags)")
+    return csv_settings(query_tag_keys(categories, tag_keys, combined))
+
+
+def _merge_element(
+    features: FeatureMap,
+    el: Dict[str, Any],
+    classify: Classifier,
+    include_social: bool = True,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+) -> None:
+    # Convert on first sight and keep only the feature; later sightings just add categories.
+    # Elements that can't become features are remembered as None so they are not re-converted.
+    cats = classify(el.get("tags") or {})
+    if not cats:
+        return
+    key = (el.get("type"), el.get("id"))
+    if key in features:
+        rec = features[key]
+        if rec is not None:
+            rec.add_categories(cats)
+        return
+    try:
+        features[key] = to_record(el, cats, include_social=include_social, tag_keys=tag_keys)
+    except Exception:
+        # Skip elements without usable coordinates
+        features[key] = None
+
+
+def _merge_features(into: FeatureMap, other: FeatureMap) -> None:
+    for key, feat in other.items():
+        if key not in into:
+            into[key] = feat
+            continue
+        prev = into[key]
+        if prev is not None and feat is not None:
+            prev.add_categories(feat.categories)
+
+
+def _fetch_features(
+    endpoints: List[str],
+    ql: str,
+    classify: Classifier,
+    retries: int = 3,
+    slots: Optional[Dict[str, threading.Semaphore]] = None,
+    cache: Optional[OverpassCache] = None,
+    include_social: bool = True,
+    scheduler: Optional[EndpointScheduler] = None,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+) -> Tuple[FeatureMap, Dict[str, Any]]:
+    features: FeatureMap = {}
+    header: Dict[str, Any] = {}
+    for el in stream_overpass(endpoints, ql, retries=retries, slots=slots, cache=cache, meta=header, scheduler=scheduler):
+        _merge_element(features, el, classify, include_social=include_social, tag_keys=tag_keys)
+    return features, header
+
+
+def parse_endpoints(endpoint: str) -> List[str]:
+    return [e.strip() for e in endpoint.split(',') if e.strip()] or DEFAULT_ENDPOINTS
+
+
+def scrape(
+    endpoint: str,
+    categories: List[str],
+    include_social: bool = True,
+    retries: int = 3,
+    tiles: str = "",
+    concurrency: int = 2,
+    cache: Optional[OverpassCache] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    combined: bool = False,
+    scheduler: Optional[EndpointScheduler] = None,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+    csv: bool = False,
+) -> List[PlaceRecord]:
+    """Fetch all categories and return PlaceRecords (see write_geojson() / PlaceRecord.to_geojson()).
+
+    Responses are parsed as a stream and converted element by element, so only the
+    resulting records are kept in memory. With `combined`, all categories are fetched in
+    one union query and classified locally. Records keep only `tag_keys` of the OSM tags
+    (None keeps all); with `csv` Overpass is asked for just the needed tag columns
+    (out:csv) instead of full JSON. If `meta` is given it receives "timestamp_osm_base"
+    (the OSM data timestamp of the responses; not available with `csv`).
+    """
+    if tiles:
+        return scrape_tiled(
+            endpoint, categories, tiles, include_social=include_social, retries=retries,
+            concurrency=concurrency, cache=cache, meta=meta, combined=combined, scheduler=scheduler,
+            tag_keys=tag_keys, csv=csv,
+        )
+
+    endpoints = parse_endpoints(endpoint)
+    scheduler = scheduler or EndpointScheduler(endpoints)
+    settings = job_settings(categories, tag_keys, combined=combined, csv=csv)
+    features: FeatureMap = {}
+
+    for _, ql, classify in build_jobs(categories, combined=combined, settings=settings):
+        header: Dict[str, Any] = {}
+        for el in stream_overpass(endpoints, ql, retries=retries, cache=cache, meta=header, scheduler=scheduler):
+            _merge_element(features, el, classify, include_social=include_social, tag_keys=tag_keys)
+        _note_osm_base(meta, {"osm3s": header})
+
+    return [f for f in features.values() if f is not None]
+
+
+def scrape_tiled(
+    endpoint: str,
+    categories: List[str],
+    tiles: str,
+    include_social: bool = True,
+    retries: int = 3,
+    concurrency: int = 2,
+    tile_retries: int = 2,
+    cache: Optional[OverpassCache] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    combined: bool = False,
+    scheduler: Optional[EndpointScheduler] = None,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+    csv: bool = False,
+) -> List[PlaceRecord]:
+    """Fetch categories tile by tile, concurrently across endpoints.
+
+    At most `concurrency` requests run against each endpoint at a time. Tiles that fail are
+    retried on their own (up to `tile_retries` extra rounds) before the scrape gives up.
+    """
+    endpoints = parse_endpoints(endpoint)
+    scheduler = scheduler or EndpointScheduler(endpoints)
+    slots = {ep: threading.BoundedSemaphore(max(1, concurrency)) for ep in endpoints}
+    settings = job_settings(categories, tag_keys, combined=combined, csv=csv)
+    jobs = [
+        (tile[0], label, ql, classify)
+        for tile in build_tiles(tiles)
+        for label, ql, classify in build_jobs(categories, tile, combined=combined, settings=settings)
+    ]
+
+    features: FeatureMap = {}
+
+    pending = jobs
+    for _ in range(tile_retries + 1):
+        failed: List[Tuple[str, str, str, Classifier]] = []
+        with ThreadPoolExecutor(max_workers=max(1, concurrency) * len(endpoints)) as pool:
+            futs = {
+                pool.submit(
+                    # A fresh context copy per task keeps per-stage HTTP counters working
+                    contextvars.copy_context().run,
+                    _fetch_features, endpoints, job[2], job[3], retries, slots, cache, include_social, scheduler, tag_keys,
+                ): job
+                for job in pending
+            }
+            for fut in as_completed(futs):
+                label, cat = futs[fut][:2]
+                try:
+                    tile_features, header = fut.result()
+                except Exception as e:
+                    print(f"Tile {label} ({cat}) failed: {e}", file=sys.stderr)
+                    failed.append(futs[fut])
+                    continue
+                # Merge on the main thread only
+                _note_osm_base(meta, {"osm3s": header})
+                _merge_features(features, tile_features)
+        if not failed:
+            break
+        pending = failed
+    else:
+        labels = ", ".join(f"{label}:{cat}" for label, cat, _, _ in failed)
+        raise RuntimeError(f"Overpass tiles failed after retries: {labels}")
+
+    return [f for f in features.values() if f is not None]
+
+
+def scrape_extract(
+    path: str,
+    categories: List[str],
+    include_social: bool = True,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+) -> List[PlaceRecord]:
+    """Build the same records as scrape() from a local .osm.pbf / OSM XML extract, without network."""
+    classify = compile_categories(CATEGORY_DEFS, categories)
+    keys = required_keys(e for c in categories for e in CATEGORY_DEFS.get(c, []))
+    features: FeatureMap = {}
+    for el in iter_extract_elements(path, classify, keys):
+        _merge_element(features, el, classify, include_social=include_social, tag_keys=tag_keys)
+    return [f for f in features.values() if f is not None]
+
+
+def _decode_adiff(resp: requests.Response) -> Dict[str, Any]:
+    return parse_adiff(resp.content)
+
+
+def scrape_incremental(
+    endpoint: str,
+    categories: List[str],
+    base_features: List[PlaceRecord],
+    since: str,
+    include_social: bool = True,
+    retries: int = 3,
+    cache: Optional[OverpassCache] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    scheduler: Optional[EndpointScheduler] = None,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+) -> List[PlaceRecord]:
+    """Apply OSM changes since `since` (ISO timestamp) to records from a previous scrape.
+
+    Each category is re-queried as an augmented diff ([adiff:]), so elements that were
+    created, modified, deleted or stopped matching the category's selectors are all reported.
+    """
+    endpoints = parse_endpoints(endpoint)
+    scheduler = scheduler or EndpointScheduler(endpoints)
+    by_key: Dict[Tuple[str, Any], PlaceRecord] = {rec.key: rec for rec in base_features}
+
+    settings = f'[out:xml][timeout:180][adiff:"{since}"]'
+    for cat, ql in build_master_query(categories, settings=settings):
+        data = run_overpass(endpoints, ql, retries=retries, cache=cache, decode=_decode_adiff, scheduler=scheduler)
+        _note_osm_base(meta, data)
+        for change in data.get("actions", []):
+            el = change["element"]
             key = (el.get("type"), el.get("id"))
-            if key not in elements:
-                elements[key] = el
-                el_cats[key] = []
-            el_cats[key].append(cat)
-
-    # Convert to GeoJSON features
-    features: List[Dict[str, Any]] = []
-    for key, el in elements.items():
-        cats = el_cats.get(key, [])
+            prev = by_key.get(key)
+            cats = set(prev.categories) if prev else set()
+            if change["action"] == "delete":
+                # Deleted, or no longer matches this category's selectors
+                cats.discard(cat)
+                if not cats:
+                    by_key.pop(key, None)
+                elif prev:
+                    prev.categories = tuple(sorted(cats))
+                continue
+            cats.add(cat)
+            try:
+                by_key[key] = to_record(el, sorted(cats), include_social=include_social, tag_keys=tag_keys)
+            except Exception:
+                # Lost its website/coordinates or became denied
+                by_key.pop(key, None)
+    return list(by_key.values())
+
+
+def read_geojson(path: str, tag_keys: Optional[Tuple[str, ...]] = None) -> List[PlaceRecord]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [PlaceRecord.from_geojson(feat, tag_keys) for feat in json.load(f).get("features", [])]
+
+
+def refresh(
+    endpoint: str,
+    categories: List[str],
+    snapshot_path: str,
+    state_path: str = "",
+    include_social: bool = True,
+    retries: int = 3,
+    tiles: str = "",
+    concurrency: int = 2,
+    cache: Optional[OverpassCache] = None,
+    combined: bool = False,
+    scheduler: Optional[EndpointScheduler] = None,
+    tag_keys: Optional[Tuple[str, ...]] = DEFAULT_TAG_KEYS,
+    csv: bool = False,
+) -> List[PlaceRecord]:
+    """Update snapshot_path incrementally when a previous run's state allows it, else scrape in full.
+
+    The snapshot and its state file (OSM data timestamp of the last successful run) are
+    rewritten on success. Without a timestamp from the server (always the case with
+    `csv`) the state has none, so the next run scrapes in full rather than diffing from
+    a guess.
+    """
+    state_path = state_path or str(Path(snapshot_path).with_suffix(".state.json"))
+    state = load_state(state_path)
+    since = state.get("timestamp_osm_base")
+    meta: Dict[str, Any] = {}
+    mode = "full"
+    features: Optional[List[PlaceRecord]] = None
+    if since and sorted(state.get("categories") or []) == sorted(categories) and Path(snapshot_path).exists():
         try:
-            feat = to_feature(el, cats, include_social=include_social)
-            features.append(feat)
-        except Exception:
-            # Skip elements without usable coordinates
-            continue
+            base = read_geojson(snapshot_path, tag_keys)
+            features = scrape_incremental(
+                endpoint, categories, base, since, include_social=include_social,
+                retries=retries, cache=cache, meta=meta, scheduler=scheduler, tag_keys=tag_keys,
+            )
+            mode = "incremental"
+        except Exception as e:
+            print(f"Incremental refresh failed ({e}); falling back to full scrape", file=sys.stderr)
+            features = None
+            meta = {}
+    if features is None:
+        features = scrape(
+            endpoint, categories, include_social=include_social, retries=retries,
+            tiles=tiles, concurrency=concurrency, cache=cache, meta=meta, combined=combined,
+            scheduler=scheduler, tag_keys=tag_keys, csv=csv,
+        )
+    write_geojson(features, snapshot_path)
+    # Never the local clock: a lagging replica's data is older, and edits made in between
+    # would be skipped by every later diff. An incremental run without a timestamp can
+    # safely diff from the same point again.
+    osm_base = meta.get("timestamp_osm_base") or (since if mode == "incremental" else None)
+    if not osm_base:
+        print("No OSM data timestamp from the server; the next refresh will scrape in full", file=sys.stderr)
+    new_state: Dict[str, Any] = {
+        "categories": sorted(categories),
+        "mode": mode,
+        "finished_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    if osm_base:
+        new_state["timestamp_osm_base"] = osm_base
+    save_state(state_path, new_state)
     return features
 
 
-def write_geojson(features: List[Dict[str, Any]], out_path: str) -> None:
-    fc = {"type": "FeatureCollection", "features": features}
+def write_geojson(features: List[PlaceRecord], out_path: str) -> None:
+    # Serialize one feature at a time; records only become dicts here
     with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(fc, f, ensure_ascii=False)
+        f.write('{"type": "FeatureCollection", "features": [')
+        for i, rec in enumerate(features):
+            if i:
+                f.write(", ")
+            json.dump(rec.to_geojson(), f, ensure_ascii=False)
+        f.write("]}")
 
 
 def main(argv: List[str]) -> int:
@@ -231,6 +970,20 @@ def main(argv: List[str]) -> int:
     parser.add_argument("--out", default="data/lawnmover.geojson", help="Output GeoJSON path")
     parser.add_argument("--include-social", action="store_true", help="Allow social profile URLs if no website present")
     parser.add_argument("--retries", type=int, default=3, help="Retries per Overpass query across endpoints")
+    parser.add_argument("--tiles", default="", help="Split the country into tiles: 'counties' or a grid like '4x3' (default: one national query)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Max concurrent tile requests per endpoint (tiled mode)")
+    parser.add_argument("--cache-dir", default="", help="Directory for the on-disk Overpass response cache (disabled if empty)")
+    parser.add_argument("--cache-ttl", type=float, default=86400, help="Max age in seconds of cached responses (default 1 day)")
+    parser.add_argument("--cache-only", action="store_true", help="Replay cached responses only; never contact Overpass")
+    parser.add_argument("--combined", action="store_true", help="Fetch all categories in one union query and classify locally")
+    parser.add_argument("--extract", default="", help="Read a local .osm.pbf / .osm(.gz|.bz2) extract instead of querying Overpass")
+    parser.add_argument("--incremental", action="store_true", help="Apply changes since the last successful run to the existing --out file")
+    parser.add_argument("--hedge-quantile", type=float, default=0, help="Send a backup request when an endpoint is slower than this quantile of its past latency, e.g. 0.9 (0 disables)")
+    parser.add_argument("--no-status-check", action="store_true", help="Don't consult /api/status for free query slots")
+    parser.add_argument("--state", default="", help="State file for --incremental (default: <out>.state.json)")
+    parser.add_argument("--tags", default="", help="Comma-separated OSM tags to keep in each feature, or 'all' (default: opening_hours,brand,shop,phone,contact:phone)")
+    parser.add_argument("--fgb", default="", help="Also write the features as an R-tree indexed FlatGeobuf file to this path")
+    parser.add_argument("--csv", action="store_true", help="Ask Overpass for only the needed tag columns (out:csv) instead of full JSON")
     args = parser.parse_args(argv)
 
     cats = [c.strip() for c in args.categories.split(",") if c.strip()]
@@ -242,10 +995,52 @@ def main(argv: List[str]) -> int:
         return 2
 
     print(f"Fetching categories: {', '.join(cats)}")
-    features = scrape(args.endpoint, cats, include_social=args.include_social, retries=args.retries)
-    print(f"Fetched features: {len(features)}")
-    write_geojson(features, args.out)
+    tag_keys = parse_tag_keys(args.tags)
+    try:
+        build_tiles(args.tiles)
+        job_settings(cats, tag_keys, combined=args.combined, csv=args.csv)
+        if args.combined or args.extract:
+            # Fail early if a selector uses syntax the local matcher can't evaluate
+            compile_categories(CATEGORY_DEFS, cats)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    if args.cache_only and not args.cache_dir:
+        print("--cache-only requires --cache-dir", file=sys.stderr)
+        return 2
+    cache = OverpassCache(args.cache_dir, ttl=args.cache_ttl, offline=args.cache_only) if args.cache_dir else None
+    scheduler = EndpointScheduler(
+        parse_endpoints(args.endpoint), check_status=not args.no_status_check,
+        hedge_quantile=args.hedge_quantile or None,
+    )
+
+    if args.extract:
+        features = scrape_extract(args.extract, cats, include_social=args.include_social, tag_keys=tag_keys)
+        print(f"Fetched features: {len(features)}")
+        write_geojson(features, args.out)
+    elif args.incremental:
+        features = refresh(
+            args.endpoint, cats, args.out, state_path=args.state, include_social=args.include_social,
+            retries=args.retries, tiles=args.tiles, concurrency=args.concurrency, cache=cache,
+            combined=args.combined, scheduler=scheduler, tag_keys=tag_keys, csv=args.csv,
+        )
+        print(f"Fetched features: {len(features)}")
+    else:
+        features = scrape(
+            args.endpoint, cats, include_social=args.include_social, retries=args.retries,
+            tiles=args.tiles, concurrency=args.concurrency, cache=cache, combined=args.combined,
+            scheduler=scheduler, tag_keys=tag_keys, csv=args.csv,
+        )
+        print(f"Fetched features: {len(features)}")
+        write_geojson(features, args.out)
     print(f"Wrote {args.out}")
+    if args.fgb:
+        write_flatgeobuf((rec.to_geojson() for rec in features), args.fgb, name=Path(args.fgb).stem)
+        print(f"Wrote {args.fgb}")
+    if not args.extract:
+        print("Endpoint stats:\n" + scheduler.report(), file=sys.stderr)
+        print("HTTP:\n" + get_client().report(), file=sys.stderr)
     return 0
 
 
@@ -0,0 +1,129 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+_DECODER = json.JSONDecoder()
+_WS = " \t\r\n"
+_ELEMENTS_RE = re.compile(r'"elements"\s*:\s*\[')
+_OSM_BASE_RE = re.compile(r'"timestamp_osm_base"\s*:\s*"([^"]+)"')
+
+
+class _Buffer:
+    """Text buffer fed from a byte-chunk iterator, trimmed as it is consumed."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append the next chunk; return False at end of input."""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            # Drop the consumed prefix so the buffer only holds unparsed data
+            self.text = self.text[self.pos:] + self._decoder.decode(chunk)
+            self.pos = 0
+            return True
+        self.text = self.text[self.pos:] + self._decoder.decode(b"", final=True)
+        self.pos = 0
+        self.eof = True
+        return False
+
+    def skip(self, chars: str) -> None:
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in chars:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+
+def iter_elements(chunks: Iterable[bytes], meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield the objects of an Overpass JSON response's "elements" array one at a time.
+
+    Only the current element (plus one network chunk) is held in memory. If `meta` is
+    given it receives "timestamp_osm_base" from the response header.
+    """
+    buf = _Buffer(chunks)
+    # Header: everything up to the opening bracket of "elements"
+    while True:
+        m = _ELEMENTS_RE.search(buf.text)
+        if m:
+            break
+        if not buf.fill():
+            if buf.text.strip():
+                # No elements array at all (e.g. an error document); validate it like resp.json() would
+                json.loads(buf.text)
+            return
+    if meta is not None:
+        ts = _OSM_BASE_RE.search(buf.text, 0, m.start())
+        if ts:
+            meta["timestamp_osm_base"] = ts.group(1)
+    buf.pos = m.end()
+
+    while True:
+        buf.skip(_WS + ",")
+        if buf.pos >= len(buf.text):
+            raise ValueError("Truncated Overpass response: unterminated elements array")
+        if buf.text[buf.pos] == "]":
+            return
+        while True:
+            try:
+                el, end = _DECODER.raw_decode(buf.text, buf.pos)
+                break
+            except json.JSONDecodeError:
+                # Element spans a chunk boundary; read more and retry
+                if not buf.fill():
+                    raise
+        buf.pos = end
+        yield el
+
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    rest = ""
+    for chunk in chunks:
+        rest += decoder.decode(chunk)
+        *lines, rest = rest.split("\n")
+        yield from lines
+    rest += decoder.decode(b"", final=True)
+    if rest:
+        yield rest
+
+
+def iter_csv_elements(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """Yield Overpass-shaped elements from a tab-separated `[out:csv(...; true; "\\t")]` response.
+
+    The header row names the columns: "@type", "@id", "@lat", "@lon" (the center for ways and
+    relations with `out center`) and one column per requested tag. Empty cells count as
+    absent tags, since CSV can't tell the two apart. Rows whose values contain tabs are
+    ambiguous and skipped.
+    """
+    header: Optional[list] = None
+    for line in _iter_lines(chunks):
+        cells = line.rstrip("\r").split("\t")
+        if header is None:
+            header = cells
+            if "@id" not in header:
+                raise ValueError(f"Not an Overpass CSV response: {line[:200]!r}")
+            continue
+        if len(cells) != len(header) or not line.strip():
+            continue
+        row = dict(zip(header, cells))
+        el: Dict[str, Any] = {
+            "type": row.get("@type", ""),
+            "id": int(row["@id"]) if row["@id"].isdigit() else row["@id"],
+            "tags": {k: v for k, v in row.items() if v and not k.startswith("@")},
+        }
+        if row.get("@lat") and row.get("@lon"):
+            coords = {"lat": float(row["@lat"]), "lon": float(row["@lon"])}
+            if el["type"] == "node":
+                el.update(coords)
+            else:
+                el["center"] = coords
+        yield el
@@ -0,0 +1,114 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+TagPairs = Tuple[Tuple[str, str], ...]
+
+
+def project_tags(tags: Dict[str, str], keys: Optional[Iterable[str]]) -> TagPairs:
+    """Keep only `keys` (in that order) from an OSM tag dict; keys=None keeps every tag."""
+    if keys is None:
+        return tuple(tags.items())
+    return tuple((k, tags[k]) for k in keys if tags.get(k))
+
+
+class PlaceRecord:
+    """Compact in-memory form of one scraped feature.
+
+    Scrapes keep these slotted records (flat fields, tags as a tuple of pairs) instead of
+    nested GeoJSON dicts; to_geojson() builds the output dict only when it is serialized.
+    """
+
+    __slots__ = (
+        "type", "id", "lat", "lon", "name", "categories", "link",
+        "street", "housenumber", "postcode", "city", "tags",
+    )
+
+    def __init__(
+        self,
+        type: str,
+        id: Any,
+        lat: float,
+        lon: float,
+        name: str,
+        categories: Tuple[str, ...],
+        link: str,
+        street: Optional[str] = None,
+        housenumber: Optional[str] = None,
+        postcode: Optional[str] = None,
+        city: Optional[str] = None,
+        tags: TagPairs = (),
+    ):
+        self.type = type
+        self.id = id
+        self.lat = lat
+        self.lon = lon
+        self.name = name
+        self.categories = categories
+        self.link = link
+        self.street = street
+        self.housenumber = housenumber
+        self.postcode = postcode
+        self.city = city
+        self.tags = tags
+
+    @property
+    def key(self) -> Tuple[str, Any]:
+        return (self.type, self.id)
+
+    @property
+    def osm_url(self) -> str:
+        return f"https://www.openstreetmap.org/{self.type}/{self.id}"
+
+    @property
+    def address(self) -> str:
+        parts = []
+        if self.street:
+            parts.append(self.street + (f" {self.housenumber}" if self.housenumber else ""))
+        if self.postcode or self.city:
+            parts.append(" ".join([p for p in [self.postcode, self.city] if p]))
+        return ", ".join([p for p in parts if p])
+
+    def tag(self, key: str) -> Optional[str]:
+        for k, v in self.tags:
+            if k == key:
+                return v
+        return None
+
+    def add_categories(self, cats: Iterable[str]) -> None:
+        merged = set(self.categories) | set(cats)
+        if len(merged) != len(self.categories):
+            self.categories = tuple(sorted(merged))
+
+    def to_geojson(self) -> Dict[str, Any]:
+        return {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [self.lon, self.lat]},
+            "properties": {
+                "id": f"{self.type}/{self.id}",
+                "name": self.name,
+                "categories": list(self.categories),
+                "link": self.link,
+                "osm_url": self.osm_url,
+                "address": self.address,
+                "addr": {
+                    "street": self.street,
+                    "housenumber": self.housenumber,
+                    "postcode": self.postcode,
+                    "city": self.city,
+                },
+                "tags": dict(self.tags),
+            },
+        }
+
+    @classmethod
+    def from_geojson(cls, feat: Dict[str, Any], tag_keys: Optional[Iterable[str]] = None) -> "PlaceRecord":
+        """Rebuild a record from a feature written by to_geojson() (e.g. a previous snapshot)."""
+        props = feat.get("properties", {})
+        el_type, _, el_id = (props.get("id") or "").partition("/")
+        lon, lat = (feat.get("geometry", {}).get("coordinates") or [None, None])[:2]
+        addr = props.get("addr") or {}
+        return cls(
+            el_type, int(el_id) if el_id.isdigit() else el_id, lat, lon,
+            props.get("name") or "", tuple(sorted(set(props.get("categories") or []))), props.get("link") or "",
+            addr.get("street"), addr.get("housenumber"), addr.get("postcode"), addr.get("city"),
+            project_tags(props.get("tags") or {}, tag_keys),
+        )
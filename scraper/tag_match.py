@@ -0,0 +1,99 @@
+import re
+from typing import Callable, Dict, Iterable, List, Optional
+
+# One Overpass tag filter, e.g. ["shop"], [!"shop"], ["shop"="hardware"], ["brand"~"(Jula|Biltema)", i]
+_FILTER_RE = re.compile(
+    r'\[\s*(?P<neg>!)?\s*(?P<key>"(?:[^"\\]|\\.)*"|[\w:.-]+)\s*'
+    r'(?:(?P<op>!=|=|!~|~)\s*(?P<val>"(?:[^"\\]|\\.)*"|[\w:.-]+)\s*(?P<icase>,\s*i\s*)?)?\]'
+)
+
+TagPredicate = Callable[[Dict[str, str]], bool]
+
+
+def _unquote(tok: str) -> str:
+    if len(tok) >= 2 and tok[0] == '"' and tok[-1] == '"':
+        # Only the escapes that matter for quoting; regex escapes like \d are kept as-is
+        return tok[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return tok
+
+
+def _compile_filter(m: "re.Match[str]") -> TagPredicate:
+    key = _unquote(m.group("key"))
+    op = m.group("op")
+    if op is None:
+        if m.group("neg"):
+            return lambda tags: key not in tags
+        return lambda tags: key in tags
+    if m.group("neg"):
+        raise ValueError(f"Unsupported tag filter: {m.group(0)}")
+    val = _unquote(m.group("val"))
+    if op == "=":
+        return lambda tags: tags.get(key) == val
+    if op == "!=":
+        return lambda tags: tags.get(key) != val
+    # Overpass regexes are unanchored searches, like re.search
+    rx = re.compile(val, re.IGNORECASE if m.group("icase") else 0)
+    if op == "~":
+        return lambda tags: key in tags and rx.search(tags[key]) is not None
+    return lambda tags: key not in tags or rx.search(tags[key]) is None
+
+
+def compile_expr(expr: str) -> TagPredicate:
+    """Compile a chain of Overpass tag filters (as used in CATEGORY_DEFS) into a predicate on a tag dict.
+
+    All filters in the chain must match. Raises ValueError for syntax the matcher does not support.
+    """
+    preds: List[TagPredicate] = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = _FILTER_RE.match(expr, pos)
+        if not m:
+            raise ValueError(f"Unsupported tag expression: {expr!r}")
+        preds.append(_compile_filter(m))
+        pos = m.end()
+        while pos < len(expr) and expr[pos].isspace():
+            pos += 1
+    if not preds:
+        raise ValueError("Empty tag expression")
+    return lambda tags: all(p(tags) for p in preds)
+
+
+def expr_keys(expr: str) -> List[str]:
+    """Return the tag keys a chain of Overpass tag filters looks at, in order of appearance."""
+    keys: List[str] = []
+    for m in _FILTER_RE.finditer(expr):
+        key = _unquote(m.group("key"))
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def required_keys(exprs: Iterable[str]) -> Optional[List[str]]:
+    """Keys of which anything matching one of the expressions has at least one.
+
+    None if some expression can match without any particular key (only negative filters),
+    so callers can't prefilter on keys.
+    """
+    keys: List[str] = []
+    for expr in exprs:
+        present = [
+            _unquote(m.group("key")) for m in _FILTER_RE.finditer(expr)
+            if not m.group("neg") and m.group("op") in (None, "=", "~")
+        ]
+        if not present:
+            return None
+        for key in present:
+            if key not in keys:
+                keys.append(key)
+    return keys
+
+
+def compile_categories(defs: Dict[str, List[str]], categories: List[str]) -> Callable[[Dict[str, str]], List[str]]:
+    """Return a classifier mapping an element's tags to the categories (in given order) it matches."""
+    compiled = [(cat, [compile_expr(e) for e in defs.get(cat, [])]) for cat in categories]
+
+    def classify(tags: Dict[str, str]) -> List[str]:
+        return [cat for cat, preds in compiled if any(p(tags) for p in preds)]
+
+    return classify
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# scraper/ modules import each other by bare name, as when run as scripts
+for p in (ROOT, ROOT / "scraper"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
@@ -0,0 +1,98 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import overpass_scraper as o
+from endpoints import EndpointScheduler
+
+QL = "[out:json];node;out;"
+
+
+def _server(delay: float, status: int = 200):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(delay)
+            body = b'{"elements": []}'
+            try:
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except OSError:
+                pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}/api/interpreter"
+
+
+@pytest.fixture
+def legs(monkeypatch):
+    # Record every hedged leg with the timeout it was started with
+    started = []
+    orig = o._start_leg
+
+    def start(ep, ql, scheduler, timeout, leg):
+        fut = orig(ep, ql, scheduler, timeout, leg)
+        started.append((ep, timeout, leg, fut))
+        return fut
+
+    monkeypatch.setattr(o, "_start_leg", start)
+    return started
+
+
+def test_losing_hedge_is_aborted_and_gives_back_its_slot(legs):
+    slow, slow_ep = _server(30)
+    fast, fast_ep = _server(0.1)
+    try:
+        scheduler = EndpointScheduler([slow_ep, fast_ep], hedge_quantile=0.9, hedge_min_delay=0.3, hedge_default_delay=0.3)
+        slots = {ep: threading.BoundedSemaphore(1) for ep in (slow_ep, fast_ep)}
+        ep, resp, slot, _ = o._open_stream([slow_ep, fast_ep], QL, scheduler, slots)
+        try:
+            assert ep == fast_ep
+        finally:
+            resp.close()
+            slot.release()
+
+        loser = next(leg for leg_ep, _, leg, _ in legs if leg_ep == slow_ep)
+        loser_fut = next(fut for leg_ep, _, _, fut in legs if leg_ep == slow_ep)
+        assert loser.abandoned and loser.session.aborted
+        # The loser's slot is back right away and its request ends long before the server answers
+        assert slots[slow_ep].acquire(blocking=False)
+        slots[slow_ep].release()
+        loser_fut.exception(timeout=5)
+        assert not any(t.name.startswith("overpass-hedge") and t.is_alive() for t in threading.enumerate())
+        # Aborting the loser is not held against its endpoint
+        assert scheduler.stats()[slow_ep]["errors"] == 0
+    finally:
+        slow.shutdown()
+        fast.shutdown()
+
+
+def test_hedge_gets_short_timeout_and_failover_full_timeout(legs):
+    slow, slow_ep = _server(1.0)
+    broken, broken_ep = _server(0, status=500)
+    fast, fast_ep = _server(0)
+    try:
+        scheduler = EndpointScheduler([slow_ep, fast_ep], hedge_quantile=0.9, hedge_min_delay=0.3, hedge_default_delay=0.3)
+        _, resp, _, _ = o._open_stream([slow_ep, fast_ep], QL, scheduler)
+        resp.close()
+        assert [(ep, t) for ep, t, _, _ in legs] == [(slow_ep, o.QUERY_TIMEOUT), (fast_ep, o.HEDGE_TIMEOUT)]
+
+        legs.clear()
+        scheduler = EndpointScheduler([broken_ep, fast_ep], hedge_quantile=0.9, hedge_min_delay=0.3, hedge_default_delay=0.3)
+        ep, resp, _, _ = o._open_stream([broken_ep, fast_ep], QL, scheduler)
+        resp.close()
+        assert ep == fast_ep
+        assert [(ep, t) for ep, t, _, _ in legs] == [(broken_ep, o.QUERY_TIMEOUT), (fast_ep, o.QUERY_TIMEOUT)]
+    finally:
+        slow.shutdown()
+        broken.shutdown()
+        fast.shutdown()
@@ -0,0 +1,80 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+import overpass_scraper as o
+
+CATEGORIES = ["robot_mower_seller"]
+OSM_BASE = "2026-01-01T00:00:00Z"
+
+CSV_BODY = "@type\t@id\t@lat\t@lon\tname\tshop\twebsite\n" "node\t1\t59.3\t18.0\tJula Kista\thardware\thttps://jula.se\n"
+JSON_BODY = {
+    "osm3s": {"timestamp_osm_base": OSM_BASE},
+    "elements": [{"type": "node", "id": 1, "lat": 59.3, "lon": 18.0, "tags": {"name": "Jula Kista", "shop": "hardware", "website": "https://jula.se"}}],
+}
+# An augmented diff without <meta osm_base>
+ADIFF_BODY = (
+    '<osm version="0.6"><action type="create">'
+    '<node id="2" lat="59.4" lon="18.1"><tag k="name" v="Bauhaus"/><tag k="shop" v="doityourself"/><tag k="website" v="https://bauhaus.se"/></node>'
+    "</action></osm>"
+)
+
+
+@pytest.fixture
+def overpass():
+    queries = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            ql = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())["data"][0]
+            queries.append(ql)
+            if "adiff" in ql:
+                body = ADIFF_BODY.encode()
+            elif ql.lstrip().startswith("[out:csv"):
+                body = CSV_BODY.encode()
+            else:
+                body = json.dumps(JSON_BODY).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/api/interpreter", queries
+    srv.shutdown()
+
+
+def test_csv_refresh_never_diffs_from_a_guessed_timestamp(overpass, tmp_path):
+    endpoint, queries = overpass
+    snapshot = str(tmp_path / "snap.geojson")
+    state_path = str(tmp_path / "snap.state.json")
+    for _ in range(2):
+        features = o.refresh(endpoint, CATEGORIES, snapshot, state_path, retries=1, csv=True)
+        assert [f.name for f in features] == ["Jula Kista"]
+        state = json.loads(open(state_path, encoding="utf-8").read())
+        assert state["mode"] == "full"
+        assert "timestamp_osm_base" not in state
+    assert queries and not any("adiff" in q for q in queries)
+
+
+def test_incremental_refresh_without_timestamp_keeps_previous_one(overpass, tmp_path):
+    endpoint, queries = overpass
+    snapshot = str(tmp_path / "snap.geojson")
+    state_path = str(tmp_path / "snap.state.json")
+    o.refresh(endpoint, CATEGORIES, snapshot, state_path, retries=1)
+    assert json.loads(open(state_path, encoding="utf-8").read())["timestamp_osm_base"] == OSM_BASE
+
+    features = o.refresh(endpoint, CATEGORIES, snapshot, state_path, retries=1)
+    state = json.loads(open(state_path, encoding="utf-8").read())
+    assert state["mode"] == "incremental"
+    assert sorted(f.name for f in features) == ["Bauhaus", "Jula Kista"]
+    assert f'[adiff:"{OSM_BASE}"]' in queries[-1]
+    assert state["timestamp_osm_base"] == OSM_BASE
@@ -1,11 +1,33 @@
 import json
 import os
+import sys
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA = ROOT / "data" / "friluft.geojson"
+STORE = Path(os.environ.get("PLACE_STORE", "") or ROOT / "data" / "places.sqlite")
 OUT = ROOT / "web" / "list.html"
 
+sys.path.append(str(ROOT))
+from etl.util.place_store import PlaceStore  # noqa: E402
+
+
+def load_store_items(path: Path):
+    # Only the list columns are read; the full place JSON is never parsed. The list shows
+    # the OSM places, as it did when it was built from friluft.geojson (COLORS/LABELS are
+    # the OSM categories)
+    with PlaceStore(str(path)) as store:
+        items = [{
+            "id": row["id"],
+            "name": row["name"] or "(namnlös)",
+            "link": row["website"],
+            "cats": row["categories"],
+            "lat": row["lat"],
+            "lng": row["lon"],
+        } for row in store.query(("id", "name", "website", "categories", "lat", "lon"), with_coords=True, source="OSM")]
+    items.sort(key=lambda x: (x["name"].lower(), x["id"]))
+    return items
+
 
 def load_items(path: Path):
     with open(path, "r", encoding="utf-8") as f:
@@ -110,9 +132,12 @@ HTML_TAIL = """
 
 
 def main():
-    if not DATA.exists():
-        raise SystemExit(f"Missing data file: {DATA}")
-    items = load_items(DATA)
+    if STORE.exists():
+        items = load_store_items(STORE)
+    elif DATA.exists():
+        items = load_items(DATA)
+    else:
+        raise SystemExit(f"Missing data file: {STORE} or {DATA}")
     # Only keep necessary fields to keep size down
     slim = [{
         "id": it["id"],
@@ -1,28 +1,38 @@
 import json
 import os
 import re
+import sys
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List
 
 ROOT = Path(__file__).resolve().parents[1]
 WEB = ROOT / "web"
 DATA = ROOT / "data"
 PLACES_DIR = WEB / "places"
 
+sys.path.append(str(ROOT))
+from etl.util.place_store import PlaceStore  # noqa: E402
 
-def load_places() -> List[Dict[str, Any]]:
+
+def iter_places() -> Iterator[Dict[str, Any]]:
+    # Prefer the ETL's place store: rows are streamed instead of parsing all of places.json
+    store_path = Path(os.environ.get("PLACE_STORE", "") or DATA / "places.sqlite")
+    if store_path.exists():
+        with PlaceStore(str(store_path)) as store:
+            yield from store.iter_places()
+        return
     places_path = DATA / "places.json"
     if places_path.exists():
-        return json.loads(places_path.read_text(encoding="utf-8"))
+        yield from json.loads(places_path.read_text(encoding="utf-8"))
+        return
     # Fallback from GeoJSON
     geo_path = DATA / "friluft.geojson"
     if geo_path.exists():
         geo = json.loads(geo_path.read_text(encoding="utf-8"))
-        out = []
         for i, f in enumerate(geo.get("features", [])):
             p = f.get("properties", {})
             [lon, lat] = f.get("geometry", {}).get("coordinates", [None, None])
-            out.append({
+            yield {
                 "id": p.get("id") or f"feature/{i}",
                 "name": p.get("name") or "(namnlös)",
                 "categories": p.get("categories", []),
@@ -32,9 +42,9 @@ def load_places() -> List[Dict[str, Any]]:
                 "source": {"name": "OSM", "url": p.get("osm_url")},
                 "description": None,
                 "images": [],
-            })
-        return out
-    raise SystemExit("No places.json or friluft.geojson found. Run ETL or scraper first.")
+            }
+        return
+    raise SystemExit("No places.sqlite, places.json or friluft.geojson found. Run ETL or scraper first.")
 
 
 def slugify(s: str) -> str:
@@ -128,14 +138,15 @@ def place_html(place: Dict[str, Any], base_url: str, path: str) -> str:
 
 def generate() -> None:
     base_url = os.environ.get("BASE_URL", "https://perwinroth.github.io/friluft").rstrip("/")
-    places = load_places()
     PLACES_DIR.mkdir(parents=True, exist_ok=True)
 
     index_map = {}
-    for p in places:
+    slugs: List[str] = []
+    for p in iter_places():
         sid = p.get('id') or p.get('name') or 'plats'
         slug = slugify(str(sid))
         index_map[p.get('id') or slug] = slug
+        slugs.append(slugify(str(p.get('id') or p.get('name'))))
         rel_path = f"web/places/{slug}.html"
         html = place_html(p, base_url, rel_path)
         (PLACES_DIR / f"{slug}.html").write_text(html, encoding="utf-8")
@@ -152,7 +163,7 @@ def generate() -> None:
         f"{base_url}/web/",
         f"{base_url}/web/list.html",
         f"{base_url}/web/events/",
-    ] + [f"{base_url}/web/places/{slugify(str(p.get('id') or p.get('name')))}.html" for p in places]
+    ] + [f"{base_url}/web/places/{slug}.html" for slug in slugs]
     parts = [
         "<?xml version=\"1.0\" encoding=\"UTF-8\"?>",
         "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">",